@@ -5,32 +5,68 @@
 # date         = 2023-05-13
 # how to       => anim_sim = animSim()
 #
-# dependencies = Maya
+# dependencies = numpy, scipy (Maya for sc.MayaScene)
 #
 # author = Grae Revell <grae.revell@gmail.com>
 #*******************************************************************************
+import collections
+import concurrent.futures
+import hashlib
+import logging
 import os
 import sys
 
-import helpers as h
+import numpy as np
 
-import pymel.core as pm
-import maya.cmds as cmds
+import helpers as h
+import instrument
+import scene as sc
 
 #*******************************************************************************
 # VARIABLES
 TITLE = os.path.splitext(os.path.basename(__file__))[0]
 CURRENT_PATH = os.path.dirname(__file__)
 IMG_PATH = CURRENT_PATH + "/img/{}.png"
+LOG = logging.getLogger(h.LOG_NAME + '.anim_sim')
 
 ANCHORS = 'Anchors'
 ANCHOR_LAYER = 'Anchor_Offset'
+# doubleArray of [frame, x, y, z] rows on the *_target node.
+ANCHOR_ATTR = 'anchorIndex'
+# Changes to the anchor correction below this are left unkeyed by anchors_update.
+ANCHOR_TOLERANCE = 1e-6
+LAYER_NAME = 'Anim_Sim'
+# Rotate order of sampled world space rotations (zxy).
+BUFFER_ROTATE_ORDER = 2
+
+# Worker threads for the numeric phase of build_flyers. None uses every core.
+POOL_SIZE = None
+
+# derive_rotation methods
+DERIVE_FUSED = 'fused'
+DERIVE_THREE_PASS = 'three_pass'
+
+# Bumped when the channels in the disk cache change, so older entries miss.
+CHANNEL_FORMAT = 2
+
+# Live preview layer, keyed on at most this many frames per channel.
+PREVIEW_LAYER = 'Anim_Sim_Preview'
+PREVIEW_MAX_KEYS = 500
 
 #*******************************************************************************
 # CLASS
 class Flyer:
-    def __init__(self, name):
+    """ A simulated flying object.
+
+    Args:
+        name (str): The animated node.
+        scene (sc.Scene): The scene to read from and write to.
+            Default None (sc.MayaScene)
+    """
+
+    def __init__(self, name, scene=None):
         self.name = name
+        self.scene = scene if scene is not None else sc.MayaScene()
         self.start_frame = ''
         self.end_frame = ''
         self.key_frames = []
@@ -40,81 +76,220 @@ class Flyer:
         self.start_pos_axis_2 = 0
         self.accel_axis_1 = []
         self.accel_axis_2 = []
+        self.vel_axis_1 = []
+        self.vel_axis_2 = []
         self.rot_axis_1 = []
         self.rot_axis_2 = []
-        self.rot_axis_1_dict = {}
-        self.rot_axis_2_dict = {}
+        self.rot_channels = []
         self.layer_name = ''
+        self.preview_layer = name + '_' + PREVIEW_LAYER
         self.fidelity = 0
         self.Scale = 0
         self.auto_roll = None
         self.parent = None
         self.anchors = []
+        # Anchor correction on correction_frames and its acceleration on key_frames.
+        self.correction = None
+        self.correction_frames = None
+        self.anchor_accel = None
         self.anchor_display_layer = None
-        self.anchor_layer = ''
+        self.anchor_layer = name + '_' + ANCHOR_LAYER
         self.motion_plane = ''
+        self.derive_method = DERIVE_FUSED
         
 
 #*******************************************************************************
 # COLLECT  
 
+    @instrument.stage
     def get_scene_data(self):
-        print('|get_scene_data|')
-        self.start_frame = int(cmds.playbackOptions(min=True,q=True))
-        self.end_frame = int(cmds.playbackOptions(max=True,q=True))
+        LOG.debug('|get_scene_data|')
+        self.start_frame, self.end_frame = self.scene.playback_range()
 
 
-    def get_anim_data(self, attributes):
-        """ Return dictionary of lists of keyframe values for given attributes.
+    @instrument.stage
+    def get_anim_data(self, attributes, key=None):
+        """ Return world space values for given attributes as one array.
         
         Args:
             attributes (list): The requested transfromation attributes
+            key (tuple): A key from sample_key, if already known. Default None
         
         Returns:
-            dictionary: animation data lists
+            np.ndarray: (attributes x frames) animation data
+        """
+
+        LOG.debug('|get_anim_data|')
+        # Keep the key_frames to be used later in both modes.
+        self.key_frames, samples = self.sample_world_space(key)
+        return samples[[h.CHANNELS.index(attr) for attr in attributes]]
+
+
+    @instrument.stage
+    def sample_world_space(self, key=None):
+        """ Samples the flyer's world, or parent relative, transforms.
+
+        Evaluates matrices at every frame of the build range instead of
+        constraining and baking a buffer, so nothing is left in the scene.
+        Samples are kept in h.RAW_CACHE, so a rebuild whose source animation,
+        parent and range are unchanged does not sample the scene again. The
+        anchor layer is muted, so samples never include the correction.
+
+        Args:
+            key (tuple): A key from sample_key, if already known. Default None
+
+        Returns:
+            tuple: (frames, read-only (6 x frames) block ordered as h.CHANNELS)
         """
 
-        print('|get_anim_data|')
-        self.create_world_space_buffer()
-        # Make a list of the key_frames to be used later in both modes.
-        self.key_frames = cmds.keyframe(self.name + '_buffer_raw', attribute=['translate', 'rotate'], query=True, timeChange=True)
-
-        # Make a dictionary containing lists of keyframe values for each attribute.
-        anim_data = {}
-        for attr in attributes:
-            anim_data[attr] = cmds.keyframe(self.name + '_buffer_raw', attribute='.' + attr, query=True, valueChange=True)  
-        return anim_data
-
-
-    def create_world_space_buffer(self):
-        print('|create_world_space_buffer|')
-        print('Fidelity is:')
-        print(self.fidelity)
-        print('Auto Roll is:')
-        print(self.auto_roll)
-        buffer_raw = self.name + '_buffer_raw'
-
-        pm.createNode('transform', n = buffer_raw, ss = True)
-        cmds.setAttr(buffer_raw + '.rotateOrder', 2)
-       
+        LOG.debug('|sample_world_space|')
+        LOG.debug('Fidelity is: %s', self.fidelity)
+        LOG.debug('Auto Roll is: %s', self.auto_roll)
+        frames = self.get_frames()
+        key = key or self.sample_key()
+        samples = self.cached_samples(key, frames)
+        if samples is not None:
+            return frames, samples
+        anchored = self.mute_anchor_layer(True)
+        matrices = self.scene.sample_matrices(self.name, frames)
+        if anchored:
+            self.mute_anchor_layer(False)
         if self.parent == None:
-            print('No parent set.')
+            LOG.debug('No parent set.')
         else:
-            cmds.parent( buffer_raw, self.parent )
+            parent_matrices = h.sample_parent_matrices(self.scene, self.parent, frames, key[3])
+            matrices = h.to_parent_space(matrices, parent_matrices)
+        samples = h.decompose_matrices(matrices, BUFFER_ROTATE_ORDER)
+        self.store_samples(key, frames, samples)
+        return frames, samples
+
+
+    def mute_anchor_layer(self, mute=True):
+        """ Mutes or unmutes the anchor offset layer, if there is one.
+
+        Returns:
+            bool: True if the layer exists.
+        """
+
+        if not self.scene.layer_exists(self.anchor_layer):
+            return False
+        self.scene.mute_layer(self.anchor_layer, mute)
+        return True
+
+
+    def sample_key(self):
+        """ Returns the h.RAW_CACHE key for the flyer's current sources.
+
+        Returns:
+            tuple: (name, source hash, parent, parent source hash)
+        """
+
+        # The flyer's own layers are muted or deleted whenever it is sampled.
+        exclude = [layer for layer in (self.layer_name, self.preview_layer, self.anchor_layer) if layer]
+        parent_hash = self.scene.source_hash(self.parent, exclude) if self.parent else None
+        return (self.name, self.scene.source_hash(self.name, exclude), self.parent, parent_hash)
+
+
+    def cached_samples(self, key, frames):
+        """ Returns cached samples covering frames, or None.
+
+        Args:
+            key (tuple): The key from sample_key.
+            frames (np.ndarray): The frames needed.
+
+        Returns:
+            np.ndarray: Read-only (6 x frames) block, or None on a miss.
+        """
+
+        cached = h.RAW_CACHE.lookup(key)
+        if cached is None:
+            return None
+        cached_frames, samples = cached
+        if cached_frames[0] > frames[0] or cached_frames[-1] < frames[-1]:
+            return None
+        start = int(frames[0] - cached_frames[0])
+        return samples[:, start:start + len(frames)]
+
+
+    def store_samples(self, key, frames, samples):
+        """ Keeps samples in h.RAW_CACHE, replacing older samples for key. """
+
+        samples.setflags(write=False)
+        h.RAW_CACHE.put(key, (frames, samples))
+
+
+    def invalidate_samples(self):
+        """ Drops every cached sample of this flyer.
+
+        Returns:
+            int: The number of cache entries removed.
+        """
+
+        return h.RAW_CACHE.invalidate(lambda key: key[0] == self.name)
+
+
+    def get_frames(self):
+        """ Returns every frame of the build range, including any roll.
+
+        Returns:
+            np.ndarray: The frames as floats.
+        """
 
-        # Constrain buffer to object, bake it, delete constraint.
-        cmds.parentConstraint(self.name, buffer_raw, name='buffer_constraint')
         time_range = (self.start_frame, self.end_frame)
         if self.auto_roll == True:
             # Automatically add pre / post roll from the fidelity value
             time_range = (self.start_frame - self.fidelity, self.end_frame + self.fidelity)
-        cmds.bakeResults(buffer_raw + '.translate', buffer_raw + '.rotate', t=time_range, sb=1)
-        cmds.delete('buffer_constraint')
-       
+        return np.arange(time_range[0], time_range[1] + 1, dtype=float)
+
+
+    def read_target(self):
+        """ Copies the build parameters stored on the *_target node.
+
+        Returns:
+            None
+        """
+
+        LOG.debug('|read_target|')
+        target = self.name + '_target'
+        self.parent = self.scene.get_attr(target + '.parent') or None
+        self.motion_plane = [axis for axis in str(self.scene.get_attr(target + '.motionPlane')) if axis in 'XYZ']
+        self.fidelity = self.scene.get_attr(target + '.fidelity')
+        self.Scale = self.scene.get_attr(target + '.Scale')
+        self.auto_roll = bool(self.scene.get_attr(target + '.auto_roll'))
+        self.layer_name = self.name + '_' + LAYER_NAME
+
+
+    def get_start_position(self, axis_1, axis_2):
+        """ Reads the local starting position without the flyer's layers.
+
+        Args:
+            axis_1 (str): 1st translation axis
+            axis_2 (str): 2nd translation axis
+
+        Returns:
+            None
+        """
+
+        if self.scene.layer_exists(self.layer_name):
+            self.scene.mute_layer(self.layer_name, True)
+        anchored = self.mute_anchor_layer(True)
+        self.start_pos_axis_1 = self.scene.get_attr(self.name + '.translate' + axis_1, time=self.start_frame - self.fidelity)
+        LOG.debug('self.start_pos_axis_1 is %s', self.start_pos_axis_1)
+        self.start_pos_axis_2 = self.scene.get_attr(self.name + '.translate' + axis_2, time=self.start_frame - self.fidelity)
+        if self.scene.layer_exists(self.layer_name):
+            self.scene.mute_layer(self.layer_name, False)
+        if anchored:
+            self.mute_anchor_layer(False)
+
+
 #*******************************************************************************
 # PROCESS
+    @instrument.stage
     def derive_rotation(self, axis_1, axis_2, polyOrder=3 ):
         """ Derives object's rotation from its translation.
+
+        self.derive_method selects the fused Savitzky-Golay stage (default)
+        or the original smooth / difference / filter passes.
         
         Args:
             axis_1 (str): 1st translation axis
@@ -126,21 +301,76 @@ class Flyer:
 
         """
 
-        print('|derive_rotation|')
-        if cmds.animLayer(self.layer_name, query=True, exists=True):
-            cmds.delete(self.layer_name)
+        LOG.debug('|derive_rotation|')
+        for layer in (self.layer_name, self.preview_layer):
+            if self.scene.layer_exists(layer):
+                self.scene.delete_layer(layer)
+        self.clear_correction()
         self.get_scene_data()
-        raw_anim_data = self.get_anim_data(['translate' + axis_1, 'translate' + axis_2])
-        self.raw_pos_axis_1 = raw_anim_data['translate' + axis_1]
-        self.raw_pos_axis_2 = raw_anim_data['translate' + axis_2]
-        self.pos_axis_1 = h.smooth_data(self.raw_pos_axis_1, self.fidelity, polyOrder)
-        self.pos_axis_2 = h.smooth_data(self.raw_pos_axis_2, self.fidelity, polyOrder)
-        self.accel_axis_1 = h.get_derivative(self.pos_axis_1, 2, True, self.fidelity)
-        self.accel_axis_2 = h.get_derivative(self.pos_axis_2, 2, True, self.fidelity)
+        cache = open_disk_cache(self.scene)
+        sample_key = None
+        if cache:
+            # Hashing the sources is not free, the sampling below reuses it.
+            sample_key = self.sample_key()
+            key = self.channel_key([axis_1, axis_2], polyOrder, sample_key)
+            channels = cache.load(self.name, key)
+            if channels is not None:
+                self.key_frames = self.get_frames()
+                self.set_channels(channels)
+                self.copy_rot_to_layer(self.Scale, axis_1, axis_2)
+                return
+        # Smooth and derive both axes as one (channels x frames) block.
+        raw = self.get_anim_data(['translate' + axis_1, 'translate' + axis_2], sample_key)
+        pos, vel, accel = derive_block(raw, self.fidelity, self.derive_method, polyOrder)
+        channels = {'raw': raw, 'pos': pos, 'accel': accel}
+        if vel is not None:
+            channels['vel'] = vel
+        self.set_channels(channels)
+        if cache:
+            cache.store(self.name, key, **channels)
         self.copy_rot_to_layer(self.Scale, axis_1, axis_2)
-        cmds.delete(self.name + '_buffer_raw')
 
 
+    def channel_key(self, motion_plane, polyOrder=3, sample_key=None):
+        """ Returns the disk cache key for the flyer's computed channels.
+
+        Hashes the source animation (see sample_key) with every parameter
+        the channels depend on.
+
+        Args:
+            motion_plane (list): The two translation axes.
+            polyOrder (int): The filter polynomial order. Default is 3
+            sample_key (tuple): A key from sample_key, if already known.
+                Default None
+
+        Returns:
+            str: A hex key.
+        """
+
+        frames = self.get_frames()
+        params = (CHANNEL_FORMAT, int(self.fidelity), str(self.derive_method), int(polyOrder),
+                  list(motion_plane), float(frames[0]), float(frames[-1]))
+        return hashlib.sha1(repr((sample_key or self.sample_key(), params)).encode()).hexdigest()
+
+
+    def set_channels(self, channels):
+        """ Sets the flyer's channels from (2 x frames) arrays.
+
+        Args:
+            channels (dict): 'raw', smoothed 'pos', 'accel' and optionally 'vel'.
+
+        Returns:
+            None
+        """
+
+        self.raw_pos_axis_1, self.raw_pos_axis_2 = channels['raw']
+        if 'vel' in channels:
+            self.vel_axis_1, self.vel_axis_2 = channels['vel']
+        self.pos_axis_1, self.pos_axis_2 = channels['pos']
+        self.accel_axis_1, self.accel_axis_2 = channels['accel']
+
+
+    @instrument.stage
     def integrate_translation(self, axis_1, axis_2):
         """ Derives object's translation from its rotation.
         
@@ -153,71 +383,216 @@ class Flyer:
             None
         """
 
-        print('|integrate_translation|')
+        LOG.debug('|integrate_translation|')
 
         # Get the local starting position
-        if cmds.animLayer(self.layer_name, query=True, exists=True):
-            cmds.animLayer(self.layer_name, edit=True, mute=True)
-        self.start_pos_axis_1 = cmds.getAttr(self.name + '.translate' + axis_1, time=self.start_frame - self.fidelity)
-        print('self.start_pos_axis_1 is %s' % self.start_pos_axis_1)
-        self.start_pos_axis_2 = cmds.getAttr(self.name + '.translate' + axis_2, time=self.start_frame - self.fidelity)
-        if cmds.animLayer(self.layer_name, query=True, exists=True):
-            cmds.animLayer(self.layer_name, edit=True, mute=False)
-        self.pos_axis_1 = h.get_integral(self.rot_axis_1, 2)
-        self.pos_axis_2 = h.get_integral(self.rot_axis_2, 2)
+        self.get_start_position(axis_1, axis_2)
+        self.pos_axis_1, self.pos_axis_2 = h.get_integral([self.rot_axis_1, self.rot_axis_2], 2)
         self.copy_trans_to_layer(self.Scale, axis_1, axis_2)
 
 
+    def anchor_marker(self, frame):
+        """ Returns the name of the marker node of the anchor at frame. """
+
+        return '%s_%d_anchor' % (self.name, int(frame))
+
+
+    def read_anchors(self):
+        """ Returns the anchor index stored on the *_target node.
+
+        The index is a flat doubleArray of [frame, x, y, z] rows sorted by
+        frame, with world space positions. Scenes made before the index
+        existed are indexed once from their anchor nodes.
+
+        Returns:
+            tuple: (frames, (anchors x 3) positions)
+        """
+
+        index = self.scene.get_array(self.name + '_target.' + ANCHOR_ATTR)
+        if index is None:
+            index = self.index_anchor_nodes()
+        index = index.reshape(-1, 4)
+        return index[:, 0], index[:, 1:]
+
+
+    def write_anchors(self, frames, positions):
+        """ Stores anchors, sorted by frame, as the anchor index. """
+
+        frames = np.asarray(frames, dtype=float)
+        order = np.argsort(frames, kind='stable')
+        index = np.hstack([frames[order, None], np.asarray(positions, dtype=float).reshape(-1, 3)[order]])
+        self.scene.set_array(self.name + '_target.' + ANCHOR_ATTR, index.ravel())
+
+
+    def find_anchor(self, frame, frames=None):
+        """ Returns the index row of the anchor at frame, or None.
+
+        Args:
+            frame (float): The frame.
+            frames (np.ndarray): Sorted anchor frames from read_anchors.
+                Default None (read the index)
+
+        Returns:
+            int: The row, or None.
+        """
+
+        if frames is None:
+            frames = self.read_anchors()[0]
+        idx = int(np.searchsorted(frames, frame))
+        if idx < len(frames) and frames[idx] == frame:
+            return idx
+        return None
+
+
+    def add_anchors(self, frames, positions):
+        """ Adds anchors to the index, replacing any on the same frames.
+
+        Args:
+            frames (list): The anchor frames.
+            positions (np.ndarray): (anchors x 3) world space positions.
+
+        Returns:
+            None
+        """
+
+        old_frames, old_positions = self.read_anchors()
+        keep = ~np.isin(old_frames, frames)
+        self.write_anchors(np.append(old_frames[keep], frames),
+                           np.vstack([old_positions[keep], np.asarray(positions, dtype=float).reshape(-1, 3)]))
+
+
+    def remove_anchor_frames(self, frames):
+        """ Removes the anchors on frames from the index.
+
+        Returns:
+            int: The number of anchors removed.
+        """
+
+        old_frames, old_positions = self.read_anchors()
+        keep = ~np.isin(old_frames, frames)
+        self.write_anchors(old_frames[keep], old_positions[keep])
+        return int(len(keep) - keep.sum())
+
+
+    def index_anchor_nodes(self):
+        """ Builds the anchor index from the anchor nodes of an older scene. """
+
+        LOG.debug('|index_anchor_nodes|')
+        anchor_grp = self.name + '_Anchors'
+        index = np.empty((0, 4))
+        if self.scene.obj_exists(anchor_grp):
+            # Anchor nodes are named <name>_<frame>_anchor.
+            rows = []
+            for anchor in self.scene.list_children(anchor_grp):
+                frame = float(anchor.rsplit('_', 2)[-2])
+                rows.append([frame] + list(self.scene.get_attr(anchor + '.worldMatrix[0]', time=frame)[12:15]))
+            index = np.array(rows).reshape(-1, 4)
+        self.write_anchors(index[:, 0], index[:, 1:])
+        return self.scene.get_array(self.name + '_target.' + ANCHOR_ATTR)
+
+
+    def sync_anchors(self):
+        """ Copies the world positions of the anchor markers to the index.
+
+        Artists may move markers to adjust where the flyer is pinned.
+        Anchors whose marker was deleted keep their stored position.
+
+        Returns:
+            None
+        """
+
+        LOG.debug('|sync_anchors|')
+        frames, positions = self.read_anchors()
+        positions = positions.copy()
+        for idx, frame in enumerate(frames):
+            marker = self.anchor_marker(frame)
+            if self.scene.obj_exists(marker):
+                positions[idx] = self.scene.get_attr(marker + '.worldMatrix[0]', time=frame)[12:15]
+        self.write_anchors(frames, positions)
+
+
+    @instrument.stage
     def set_anchor(self, axis_1, axis_2):
+        """ Adds an anchor at the current frame, or removes the one there.
+
+        Args:
+            axis_1 (str): 1st translation axis
+            axis_2 (str): 2nd translation axis
 
-        print('|set_anchor|')
-        if not cmds.objExists(ANCHORS):
-            cmds.group(empty=True, name=ANCHORS, parent=ROOT)
+        Returns:
+            str: The frame of the new anchor, or False if one was removed.
+        """
+
+        LOG.debug('|set_anchor|')
+        if not self.scene.obj_exists(h.ROOT):
+            self.scene.create_group(h.ROOT)
+        if not self.scene.obj_exists(ANCHORS):
+            self.scene.create_group(ANCHORS, h.ROOT)
         anchor_grp = self.name + '_Anchors'
-        if not cmds.objExists(anchor_grp):
-            cmds.group(empty=True, name=anchor_grp, parent=ANCHORS)
+        if not self.scene.obj_exists(anchor_grp):
+            self.scene.create_group(anchor_grp, ANCHORS)
         self.anchor_display_layer = self.name + '_anchors'
-        current_time = str(cmds.currentTime(query=True)).split('.')[0]
-        anchor_name = self.name + '_' + str(current_time) + '_anchor'
-        anchors = cmds.listRelatives(self.name + '_Anchors')
-        if not anchors:
-            anchors = []
-        if anchor_name not in anchors:
-            cmds.select(self.name)
-            anchor = cmds.duplicate(name=anchor_name)[0]
-            cmds.parent(anchor, anchor_grp)
-            try:
-                cmds.editDisplayLayerMembers(self.anchor_display_layer, query=True)
-            except:
-                cmds.createDisplayLayer(name=self.anchor_display_layer)
-            cmds.editDisplayLayerMembers(self.anchor_display_layer, anchor, noRecurse=True)
-            cmds.setAttr(self.anchor_display_layer + '.displayType', 1)
+        current_time = str(self.scene.current_time()).split('.')[0]
+        frame = float(current_time)
+        anchor_name = self.anchor_marker(frame)
+        if self.find_anchor(frame) is None:
+            position = self.scene.sample_matrices(self.name, [frame])[0, 3, :3]
+            self.add_anchors([frame], [position])
+            # A locator, not a copy of the flyer's geometry, marks the anchor.
+            anchor = self.scene.create_locator(anchor_name, anchor_grp, position)
+            self.scene.add_to_display_layer(self.anchor_display_layer, anchor)
             return current_time
         else:
-            cmds.delete(anchor_name)
+            self.remove_anchor_frames([frame])
+            if self.scene.obj_exists(anchor_name):
+                self.scene.delete(anchor_name)
             return False
 
 
 
+    @instrument.stage
     def remove_anchors(self):
+        """ Removes every anchor with its markers, display layer and offset layer.
+
+        Existence is checked with one query and everything found is deleted
+        with one call, however many anchors there are. A built flyer's
+        rotation is derived again without the correction, also when this
+        Flyer never applied it, and everything is undone as one step.
 
-        anchors = cmds.listRelatives(self.name + '_Anchors')
-        try:
-            for anchor in anchors:
-                cmds.delete(anchor)
-            self.anchors = []
-            cmds.delete(self.anchor_display_layer)
-            cmds.delete(self.anchor_layer)
-        except:
-            print('No anchors to remove')
+        Returns:
+            int: The number of nodes and layers removed.
+        """
+
+        LOG.debug('|remove_anchors|')
+        frames = self.read_anchors()[0]
+        self.anchor_display_layer = self.name + '_anchors'
+        self.anchor_layer = self.name + '_' + ANCHOR_LAYER
+        # Markers before their group, so none is deleted twice.
+        nodes = [self.anchor_marker(frame) for frame in frames]
+        nodes += [self.name + '_Anchors', self.anchor_display_layer, self.anchor_layer]
+        with self.scene.undo_chunk('animSim remove anchors'):
+            existing = self.scene.existing(nodes)
+            if existing:
+                self.scene.delete(existing)
+            self.write_anchors([], np.empty((0, 3)))
+            if self.scene.layer_exists(self.layer_name):
+                # The disk cache usually makes this cheap.
+                self.derive_rotation(self.motion_plane[0], self.motion_plane[1])
+        self.anchors = []
+        self.clear_correction()
+        LOG.info('Removed %d anchor nodes and layers from %s', len(existing), self.name)
+        return len(existing)
 
 
 
 
 #*******************************************************************************
 # APPLY
+    @instrument.stage
     def copy_rot_to_layer(self, scale, axis_1, axis_2):
         """ Copies acceleration values to the object's rotation on a separate layer.
+
+        Keys are written unscaled and scale is applied live by set_scale.
         
         Args:
             scale (int): Value multiplier
@@ -228,33 +603,38 @@ class Flyer:
             None
         """
 
-        print('|copy_rot_to_layer|')
-        axis1_mult = 1
-        axis2_mult = 1
-        h.create_anim_layer(self.name, self.layer_name, True)
-        cmds.animLayer(self.layer_name, edit=True, sel=True, prf=True)
-        if axis_1 == 'X' and axis_2 == 'Y':
-            axis_1 = 'Z'
-            axis1_mult = -1
-            axis_2 = 'X'
-            axis2_mult = -1
-        if axis_1 == 'X' and axis_2 == 'Z':
-            axis_1 = 'Z'
-            axis1_mult = -1
-            axis_2 = 'X'
-        if axis_1 == 'Y' and axis_2 == 'Z':
-            axis_1 = 'Z'
-            axis_2 = 'X'
-        self.rot_axis_1 = self.accel_axis_1
-        self.rot_axis_2 = self.accel_axis_2
-        # Zip key_frames and rotation values lists into tuples and then into a dictionary
-        self.rot_axis_1_dict = dict(zip(self.key_frames, self.rot_axis_1))
-        self.rot_axis_2_dict = dict(zip(self.key_frames, self.rot_axis_2))
-        for key in self.rot_axis_1_dict:
-            cmds.setKeyframe(self.name, time=key, at='rotate' + axis_1, value=(self.rot_axis_1_dict[key] * scale * axis1_mult) )
-            cmds.setKeyframe(self.name, time=key, at='rotate' + axis_2, value=(self.rot_axis_2_dict[key] * scale * axis2_mult) )
-  
+        LOG.debug('|copy_rot_to_layer|')
+        self.scene.create_layer(self.name, self.layer_name, True)
+        self.scene.set_active_layer(self.layer_name)
+        self.rot_channels, (axis1_mult, axis2_mult) = rotation_channels(axis_1, axis_2)
+        # Copies, anchors_update writes into rot_axis in place.
+        self.rot_axis_1 = np.array(self.accel_axis_1)
+        self.rot_axis_2 = np.array(self.accel_axis_2)
+        self.scene.write_keys(self.name, self.rot_channels[0], self.key_frames, self.rot_axis_1, self.layer_name, axis1_mult)
+        self.scene.write_keys(self.name, self.rot_channels[1], self.key_frames, self.rot_axis_2, self.layer_name, axis2_mult)
+        self.set_scale(scale)
+
+
+    def set_scale(self, scale):
+        """ Rescales the layer's rotation live, without recomputing or keying.
 
+        Args:
+            scale (int): Value multiplier
+
+        Returns:
+            None
+        """
+
+        LOG.debug('|set_scale|')
+        self.Scale = scale
+        for layer in (self.layer_name, self.preview_layer):
+            if not self.scene.layer_exists(layer):
+                continue
+            for attribute in self.rot_channels:
+                self.scene.scale_channel(self.name, attribute, scale, layer)
+
+
+    @instrument.stage
     def copy_trans_to_layer(self, scale, axis_1, axis_2):
         """ Copies generated values to the object's translation on a separate layer.
         
@@ -267,19 +647,24 @@ class Flyer:
             None
         """
 
-        print('|copy_trans_to_layer|')
-        cmds.animLayer(self.layer_name, edit=True, sel=True, prf=True)
-        # Zip key_frames and position values lists into tuples and then into a dictionary
-        self.pos_axis_1_dict = dict(zip(self.key_frames, self.pos_axis_1))
-        self.pos_axis_2_dict = dict(zip(self.key_frames, self.pos_axis_2))
-        print('start_pos_axis_1 is %s' % self.start_pos_axis_1)
-        for key in self.pos_axis_1_dict:
-            cmds.setKeyframe(self.name, animLayer=self.layer_name, time=key, at='translate' + axis_1, value=(self.pos_axis_1_dict[key] + self.start_pos_axis_1) )
-            cmds.setKeyframe(self.name, animLayer=self.layer_name, time=key, at='translate' + axis_2, value=(self.pos_axis_2_dict[key] + self.start_pos_axis_2) )
+        LOG.debug('|copy_trans_to_layer|')
+        self.scene.set_active_layer(self.layer_name)
+        LOG.debug('start_pos_axis_1 is %s', self.start_pos_axis_1)
+        self.scene.write_keys(self.name, 'translate' + axis_1, self.key_frames, self.pos_axis_1 + self.start_pos_axis_1, self.layer_name)
+        self.scene.write_keys(self.name, 'translate' + axis_2, self.key_frames, self.pos_axis_2 + self.start_pos_axis_2, self.layer_name)
 
 
+    @instrument.stage
     def anchors_rebuild(self, axis_1, axis_2):
         """ Creates offset layer to match animation to anchors and derives rotation.
+
+        Anchors come from the index on the *_target node (see read_anchors)
+        and the flyer is read with time-context queries, so the current time
+        never changes. The offsets are spread over every frame by
+        h.anchor_correction, a minimum acceleration curve that passes
+        through each anchor exactly, and keyed densely with one write_keys
+        call per axis, so tangent interpolation cannot disturb the derived
+        acceleration between anchors.
         
         Args:
             axis_1 (str): 1st rotation axis
@@ -289,31 +674,443 @@ class Flyer:
             None
         """
 
-        print('|anchors_rebuild|')
-        anchors = cmds.listRelatives(self.name + '_Anchors')
+        LOG.debug('|anchors_rebuild|')
+        frames, positions = self.read_anchors()
         self.anchor_layer = self.name + '_' + ANCHOR_LAYER
-        if cmds.animLayer(self.anchor_layer, query=True, exists=True):
-            cmds.delete(self.anchor_layer)
-        anim_layers = cmds.ls(type='animLayer')
-        h.create_anim_layer(self.name, self.anchor_layer, False)
-        cmds.animLayer(self.layer_name, edit=True, mute=False)
-        cmds.animLayer(self.anchor_layer, edit=True, moveLayerAfter=self.layer_name)
-        for layer in anim_layers:
-            cmds.animLayer(layer, edit=True, sel=False, prf=False)
-        cmds.animLayer(self.anchor_layer, edit=True, sel=True, prf=True)
-        for anchor in anchors:
-            print('anchor is %s' % anchor)
-            anchor_frame = anchor.split('_')[1]
-            cmds.currentTime(anchor_frame)          
-            cmds.matchTransform(self.name, anchor, position=True)
-            cmds.setKeyframe(self.name, at=['translate' + axis_1, 'translate' + axis_2])
-        # print('self.anchor_layer is %s' % self.anchor_layer)
-        # print('self.Name is %s' % self.Name)
-        # for channel in list(['X', 'Y', 'Z']):
-        #     print('channel is %s' % channel)
-        #     cmds.setAttr(self.layer_name + '|' + self.Name + '.translate' + channel, lock=True)
-        
-        #self.derive_rotation(axis_1, axis_2)
-        
-        # for channel in list(['X', 'Y', 'Z']):
-        #     cmds.setAttr(self.layer_name + '|' + self.Name + '.translate' + channel, lock=False)
\ No newline at end of file
+        if self.scene.layer_exists(self.anchor_layer):
+            self.scene.delete_layer(self.anchor_layer)
+        if not len(self.accel_axis_1):
+            # Not built in this session, the disk cache usually makes this cheap.
+            self.derive_rotation(axis_1, axis_2)
+            self.integrate_translation(axis_1, axis_2)
+        self.scene.mute_layer(self.layer_name, False)
+        offsets = self.anchor_offsets(frames, positions, [axis_1, axis_2])
+        self.scene.create_layer(self.name, self.anchor_layer, False)
+        self.scene.move_layer_after(self.anchor_layer, self.layer_name)
+        self.scene.set_active_layer(self.anchor_layer)
+        self.correction_frames = self.get_correction_frames(frames)
+        self.correction = h.anchor_correction(
+            len(self.correction_frames), (frames - self.correction_frames[0]).astype(int), offsets)
+        if len(frames):
+            self.scene.write_keys(self.name, 'translate' + axis_1, self.correction_frames, self.correction[0], self.anchor_layer)
+            self.scene.write_keys(self.name, 'translate' + axis_2, self.correction_frames, self.correction[1], self.anchor_layer)
+        # Rotation follows the acceleration of the corrected path.
+        pos, vel, self.anchor_accel = derive_block(self.build_correction(self.correction), self.fidelity, self.derive_method)
+        self.rot_axis_1 = self.accel_axis_1 + self.anchor_accel[0]
+        self.rot_axis_2 = self.accel_axis_2 + self.anchor_accel[1]
+        self.write_rotation(axis_1, axis_2)
+
+
+    @instrument.stage
+    def anchors_update(self, axis_1, axis_2, polyOrder=3):
+        """ Updates the anchor correction and rotation after an anchor edit.
+
+        Solves the correction again, then rekeys only the frames where it
+        changed. Rotation is re-derived only where the change bends, plus a
+        margin of two filter windows, and spliced into the layer curves. The
+        filters are linear, so the derivative of the change is added to the
+        stored one. Falls back to anchors_rebuild when nothing is stored or
+        the correction range changed.
+
+        Args:
+            axis_1 (str): 1st translation axis
+            axis_2 (str): 2nd translation axis
+            polyOrder (int): The filter polynomial order. Default is 3
+
+        Returns:
+            int: The number of frames whose rotation was re-derived.
+        """
+
+        LOG.debug('|anchors_update|')
+        if self.correction is None or not self.scene.layer_exists(self.anchor_layer):
+            self.anchors_rebuild(axis_1, axis_2)
+            return len(self.key_frames)
+        frames, positions = self.read_anchors()
+        correction_frames = self.get_correction_frames(frames)
+        if not np.array_equal(correction_frames, self.correction_frames):
+            self.anchors_rebuild(axis_1, axis_2)
+            return len(self.key_frames)
+        self.scene.mute_layer(self.anchor_layer, True)
+        offsets = self.anchor_offsets(frames, positions, [axis_1, axis_2])
+        self.scene.mute_layer(self.anchor_layer, False)
+        correction = h.anchor_correction(
+            len(correction_frames), (frames - correction_frames[0]).astype(int), offsets)
+        delta = correction - self.correction
+        self.correction = correction
+        changed = np.flatnonzero(np.abs(delta).max(axis=0) > ANCHOR_TOLERANCE)
+        if not len(changed):
+            return 0
+        span = slice(changed[0], changed[-1] + 1)
+        for axis, values in zip((axis_1, axis_2), correction):
+            self.scene.splice_keys(self.name, 'translate' + axis, correction_frames[span], values[span], self.anchor_layer)
+
+        # Linear and constant changes have no acceleration.
+        delta = self.build_correction(delta)
+        bent = np.flatnonzero(np.abs(np.diff(delta, 2)).max(axis=0) > ANCHOR_TOLERANCE)
+        if not len(bent):
+            return 0
+        count = delta.shape[1]
+        margin = 2 * int(self.fidelity)
+        start = max(bent[0] - margin, 0)
+        end = min(bent[-1] + 2 + margin, count)
+        pad_start = max(start - margin, 0)
+        pad_end = min(end + margin, count)
+        if pad_end - pad_start <= self.fidelity:
+            pad_start, pad_end = 0, count
+        pos, vel, accel = derive_block(delta[:, pad_start:pad_end], self.fidelity, self.derive_method, polyOrder)
+        span = slice(start, end)
+        self.anchor_accel[:, span] += accel[:, start - pad_start:end - pad_start]
+        self.rot_axis_1[span] = self.accel_axis_1[span] + self.anchor_accel[0, span]
+        self.rot_axis_2[span] = self.accel_axis_2[span] + self.anchor_accel[1, span]
+        self.write_rotation(axis_1, axis_2, span)
+        return end - start
+
+
+    def clear_correction(self):
+        """ Forgets the stored anchor correction, so the next edit rebuilds it. """
+
+        self.correction = None
+        self.correction_frames = None
+        self.anchor_accel = None
+
+
+    def get_correction_frames(self, frames):
+        """ Returns the frames of the anchor correction.
+
+        Args:
+            frames (np.ndarray): The anchor frames.
+
+        Returns:
+            np.ndarray: The build frames, extended to any anchor outside them.
+        """
+
+        if not len(frames):
+            return np.asarray(self.key_frames, dtype=float)
+        return np.arange(min(self.key_frames[0], frames[0]), max(self.key_frames[-1], frames[-1]) + 1)
+
+
+    def build_correction(self, correction):
+        """ Returns the part of a (2 x correction frames) block on key_frames. """
+
+        start = int(self.key_frames[0] - self.correction_frames[0])
+        return correction[:, start:start + len(self.key_frames)]
+
+
+    def write_rotation(self, axis_1, axis_2, span=None):
+        """ Keys rot_axis_1 and rot_axis_2 on the layer, or splices span only.
+
+        Args:
+            axis_1 (str): 1st translation axis
+            axis_2 (str): 2nd translation axis
+            span (slice): The key_frames to rewrite. Default None (all)
+
+        Returns:
+            None
+        """
+
+        channels, signs = rotation_channels(axis_1, axis_2)
+        for attribute, sign, values in zip(channels, signs, (self.rot_axis_1, self.rot_axis_2)):
+            if span is None:
+                self.scene.write_keys(self.name, attribute, self.key_frames, values, self.layer_name, sign)
+            else:
+                self.scene.splice_keys(self.name, attribute, self.key_frames[span], values[span], self.layer_name, sign)
+
+
+    def anchor_offsets(self, frames, positions, axes):
+        """ Returns the local translation offsets that move the flyer onto anchors.
+
+        Args:
+            frames (np.ndarray): The anchor frames.
+            positions (np.ndarray): (anchors x 3) world space anchor positions.
+            axes (list): The translation axes to return, e.g. ['X', 'Z'].
+
+        Returns:
+            np.ndarray: (axes x anchors) offsets from the flyer's evaluated
+                local translation.
+        """
+
+        if not len(frames):
+            return np.empty((len(axes), 0))
+        local = self.scene.sample_matrices(self.name, frames, 'matrix')[:, 3, :3]
+        parent = self.scene.sample_matrices(self.name, frames, 'parentMatrix[0]')
+        points = np.hstack([positions, np.ones((len(positions), 1))])
+        target = np.einsum('fi,fij->fj', points, np.linalg.inv(parent))[:, :3]
+        return (target - local)[:, ['XYZ'.index(axis) for axis in axes]].T
+
+
+#*******************************************************************************
+# PREVIEW
+    @instrument.stage
+    def preview_samples(self):
+        """ Returns raw positions for a live preview, from h.RAW_CACHE if possible.
+
+        Mutes the flyer's build and preview layers so the samples and the
+        start position are of the source animation. The build layer stays
+        muted while the preview is shown.
+
+        Returns:
+            tuple: (frames, (2 x frames) raw positions on the motion plane)
+        """
+
+        LOG.debug('|preview_samples|')
+        if self.scene.layer_exists(self.preview_layer):
+            self.scene.mute_layer(self.preview_layer, True)
+        self.get_scene_data()
+        self.get_start_position(self.motion_plane[0], self.motion_plane[1])
+        if self.scene.layer_exists(self.layer_name):
+            self.scene.mute_layer(self.layer_name, True)
+        frames, samples = self.sample_world_space()
+        return frames, samples[[h.CHANNELS.index('translate' + axis) for axis in self.motion_plane]]
+
+
+    @instrument.stage
+    def write_preview(self, frames, accel, integral):
+        """ Keys a preview result from process_block on the preview layer.
+
+        Keys at most PREVIEW_MAX_KEYS frames per channel. Scale is applied
+        live, as on the build layer.
+
+        Args:
+            frames (np.ndarray): The frames of the result.
+            accel (np.ndarray): (2 x frames) acceleration.
+            integral (np.ndarray): (2 x frames) integrated positions.
+
+        Returns:
+            None
+        """
+
+        LOG.debug('|write_preview|')
+        step = -(-len(frames) // PREVIEW_MAX_KEYS)
+        keep = np.unique(np.append(np.arange(0, len(frames), step), len(frames) - 1))
+        times = np.asarray(frames)[keep]
+        with self.scene.undo_chunk('animSim preview'):
+            self.scene.create_layer(self.name, self.preview_layer, True)
+            self.scene.mute_layer(self.preview_layer, False)
+            self.rot_channels, signs = rotation_channels(self.motion_plane[0], self.motion_plane[1])
+            for attribute, sign, values in zip(self.rot_channels, signs, accel):
+                self.scene.write_keys(self.name, attribute, times, values[keep], self.preview_layer, sign)
+                self.scene.scale_channel(self.name, attribute, self.Scale, self.preview_layer)
+            starts = (self.start_pos_axis_1, self.start_pos_axis_2)
+            for axis, start, values in zip(self.motion_plane, starts, integral):
+                self.scene.write_keys(self.name, 'translate' + axis, times, values[keep] + start, self.preview_layer)
+
+
+    def end_preview(self):
+        """ Deletes the preview layer and unmutes the build layer. """
+
+        LOG.debug('|end_preview|')
+        if self.scene.layer_exists(self.preview_layer):
+            self.scene.delete_layer(self.preview_layer)
+        if self.scene.layer_exists(self.layer_name):
+            self.scene.mute_layer(self.layer_name, False)
+
+
+#*******************************************************************************
+# BATCH
+def rotation_channels(axis_1, axis_2):
+    """ Returns the rotate channels and signs for a motion plane.
+
+    Args:
+        axis_1 (str): 1st translation axis
+        axis_2 (str): 2nd translation axis
+
+    Returns:
+        tuple: ([1st rotate channel, 2nd rotate channel], [1st sign, 2nd sign])
+    """
+
+    axis1_mult = 1
+    axis2_mult = 1
+    if axis_1 == 'X' and axis_2 == 'Y':
+        axis_1 = 'Z'
+        axis1_mult = -1
+        axis_2 = 'X'
+        axis2_mult = -1
+    if axis_1 == 'X' and axis_2 == 'Z':
+        axis_1 = 'Z'
+        axis1_mult = -1
+        axis_2 = 'X'
+    if axis_1 == 'Y' and axis_2 == 'Z':
+        axis_1 = 'Z'
+        axis_2 = 'X'
+    return ['rotate' + axis_1, 'rotate' + axis_2], [axis1_mult, axis2_mult]
+
+
+def open_disk_cache(scene):
+    """ Returns the h.DiskCache next to the scene file, or None if untitled. """
+
+    path = h.cache_dir(scene.scene_path())
+    return h.DiskCache(path) if path else None
+
+
+def derive_block(raw, fidelity, method=DERIVE_FUSED, polyOrder=3):
+    """ Smooths and derives a (channels x frames) block of positions.
+
+    Args:
+        raw (np.ndarray): Raw positions, one channel per row.
+        fidelity (int): The filter window size.
+        method (str): DERIVE_FUSED or DERIVE_THREE_PASS. Default DERIVE_FUSED
+        polyOrder (int): The filter polynomial order. Default is 3
+
+    Returns:
+        tuple: (position, velocity, acceleration) blocks. Velocity is None
+            for DERIVE_THREE_PASS.
+    """
+
+    if method == DERIVE_THREE_PASS:
+        pos = h.smooth_data(raw, fidelity, polyOrder)
+        return pos, None, h.get_derivative(pos, 2, True, fidelity)
+    return h.smooth_and_derive(raw, fidelity, polyOrder)
+
+
+def load_flyers(scene=None):
+    """ Returns a Flyer for every target registered under h.TARGETS.
+
+    Args:
+        scene (sc.Scene): The scene to read. Default None (sc.MayaScene)
+
+    Returns:
+        list: Flyers with the parameters stored on their *_target nodes.
+    """
+
+    scene = scene if scene is not None else sc.MayaScene()
+    flyers = []
+    for target in scene.list_children(h.TARGETS):
+        flyer = Flyer('_'.join(target.split('_')[:-1]), scene)
+        flyer.read_target()
+        flyers.append(flyer)
+    return flyers
+
+
+def process_block(raw, fidelity, method=DERIVE_FUSED, polyOrder=3):
+    """ Runs the numeric stage on a block of raw positions.
+
+    Touches no scene, so it is safe to run on a worker thread.
+
+    Args:
+        raw (np.ndarray): Raw positions, one channel per row.
+        fidelity (int): The filter window size.
+        method (str): DERIVE_FUSED or DERIVE_THREE_PASS. Default DERIVE_FUSED
+        polyOrder (int): The filter polynomial order. Default is 3
+
+    Returns:
+        tuple: (velocity, acceleration, integrated position) blocks.
+    """
+
+    pos, vel, accel = derive_block(raw, fidelity, method, polyOrder)
+    return vel, accel, h.get_integral(accel, 2)
+
+
+@instrument.stage
+def build_flyers(flyers, scene, polyOrder=3, pool_size=None):
+    """ Builds several flyers with one time sweep and stacked numeric stages.
+
+    The build runs in three phases. Scene reads happen on the calling
+    thread: every flyer and parent is sampled in a single sweep over the
+    union of the build ranges. The numeric phase stacks flyers that share
+    fidelity, derive method and frame count, splits the stacks into one
+    chunk per worker and smooths and derives them on a thread pool. All
+    layers are then written in bulk on the calling thread inside one undo
+    chunk. Flyers found in the scene's disk cache (see open_disk_cache)
+    skip sampling and the numeric phase.
+
+    Args:
+        flyers (list): The Flyers to build, with parameters set.
+        scene (sc.Scene): The scene the flyers live in.
+        polyOrder (int): The filter polynomial order. Default is 3
+        pool_size (int): Worker threads for the numeric phase.
+            Default None (POOL_SIZE)
+
+    Returns:
+        None
+    """
+
+    LOG.debug('|build_flyers|')
+    if not flyers:
+        return
+    h.MATRIX_CACHE.clear()
+    with scene.undo_chunk('animSim build'):
+        # READ
+        for flyer in flyers:
+            for layer in (flyer.layer_name, flyer.preview_layer):
+                if scene.layer_exists(layer):
+                    scene.delete_layer(layer)
+            flyer.clear_correction()
+            flyer.get_scene_data()
+            flyer.key_frames = flyer.get_frames()
+            flyer.get_start_position(flyer.motion_plane[0], flyer.motion_plane[1])
+        cache = open_disk_cache(scene)
+        channels = {}
+        channel_keys = {}
+        samples = {}
+        keys = {}
+        for flyer in flyers:
+            keys[flyer.name] = flyer.sample_key()
+            if cache:
+                channel_keys[flyer.name] = flyer.channel_key(flyer.motion_plane, polyOrder, keys[flyer.name])
+                cached = cache.load(flyer.name, channel_keys[flyer.name])
+                if cached is not None:
+                    channels[flyer.name] = cached
+                    continue
+            cached = flyer.cached_samples(keys[flyer.name], flyer.key_frames)
+            if cached is not None:
+                samples[flyer.name] = cached
+        todo = [flyer for flyer in flyers if flyer.name not in channels]
+        missing = [flyer for flyer in todo if flyer.name not in samples]
+        if missing:
+            first = min(flyer.key_frames[0] for flyer in missing)
+            last = max(flyer.key_frames[-1] for flyer in missing)
+            nodes = []
+            for flyer in missing:
+                for node in (flyer.name, flyer.parent):
+                    if node and node not in nodes:
+                        nodes.append(node)
+            anchored = [flyer for flyer in missing if flyer.mute_anchor_layer(True)]
+            matrices = scene.sample_many(nodes, np.arange(first, last + 1, dtype=float))
+            for flyer in anchored:
+                flyer.mute_anchor_layer(False)
+            for flyer in missing:
+                span = slice(int(flyer.key_frames[0] - first), int(flyer.key_frames[-1] - first) + 1)
+                world = matrices[flyer.name][span]
+                if flyer.parent:
+                    world = h.to_parent_space(world, matrices[flyer.parent][span])
+                samples[flyer.name] = h.decompose_matrices(world, BUFFER_ROTATE_ORDER)
+                flyer.store_samples(keys[flyer.name], flyer.key_frames, samples[flyer.name])
+        raw = {}
+        for flyer in todo:
+            rows = [h.CHANNELS.index('translate' + axis) for axis in flyer.motion_plane]
+            raw[flyer.name] = samples[flyer.name][rows]
+
+        # PROCESS
+        pool_size = pool_size or POOL_SIZE or os.cpu_count() or 1
+        groups = collections.OrderedDict()
+        for flyer in todo:
+            key = (flyer.fidelity, flyer.derive_method, len(flyer.key_frames))
+            groups.setdefault(key, []).append(flyer)
+        chunks = []
+        for (fidelity, method, count), group in groups.items():
+            size = -(-len(group) // pool_size)
+            for start in range(0, len(group), size):
+                chunks.append((group[start:start + size], fidelity, method))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pool_size) as pool:
+            futures = []
+            for chunk, fidelity, method in chunks:
+                block = np.vstack([raw[flyer.name] for flyer in chunk])
+                futures.append(pool.submit(derive_block, block, fidelity, method, polyOrder))
+            for (chunk, fidelity, method), future in zip(chunks, futures):
+                pos, vel, accel = future.result()
+                for idx, flyer in enumerate(chunk):
+                    rows = slice(2 * idx, 2 * idx + 2)
+                    channels[flyer.name] = {'raw': raw[flyer.name], 'pos': pos[rows], 'accel': accel[rows]}
+                    if vel is not None:
+                        channels[flyer.name]['vel'] = vel[rows]
+                    if cache:
+                        cache.store(flyer.name, channel_keys[flyer.name], **channels[flyer.name])
+        for flyer in flyers:
+            flyer.set_channels(channels[flyer.name])
+
+        # APPLY
+        for flyer in flyers:
+            flyer.copy_rot_to_layer(flyer.Scale, flyer.motion_plane[0], flyer.motion_plane[1])
+            # As integrate_translation, with the start position read above.
+            flyer.pos_axis_1, flyer.pos_axis_2 = h.get_integral([flyer.rot_axis_1, flyer.rot_axis_2], 2)
+            flyer.copy_trans_to_layer(flyer.Scale, flyer.motion_plane[0], flyer.motion_plane[1])
@@ -0,0 +1,194 @@
+#*******************************************************************************
+# content = Rebuilds every flyer in a list of scene files, headless.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => mayapy as_batch.py shots/*.ma --set ship_target.fidelity=21
+#                 python as_batch.py shots/*.json --memory
+#
+# dependencies = numpy, scipy, anim_sim (mayapy for Maya scene files)
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import argparse
+import ast
+import json
+import logging
+import multiprocessing
+import sys
+import time
+
+import anim_sim
+import helpers as h
+import instrument
+import scene as sc
+
+#*******************************************************************************
+# VARIABLES
+LOG = logging.getLogger(h.LOG_NAME + '.as_batch')
+STRING_ATTRS = ('Name', 'parent', 'motionPlane')
+
+#*******************************************************************************
+# WORKER
+def init_worker(memory):
+    """ Starts Maya once per worker process, unless running in memory. """
+
+    if not memory:
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+
+
+def apply_overrides(scene, overrides):
+    """ Writes override values onto *_target nodes.
+
+    Targets missing from the scene are skipped, so one override list can
+    serve shots that hold different flyers.
+
+    Args:
+        scene (sc.Scene): The open scene.
+        overrides (dict): {target: {attribute: value}}
+
+    Returns:
+        None
+    """
+
+    for target, values in overrides.items():
+        if not scene.obj_exists(target):
+            LOG.debug('No %s in this shot, skipping its overrides.', target)
+            continue
+        for attribute, value in values.items():
+            flags = {'type': 'string'} if attribute in STRING_ATTRS else {}
+            scene.set_attr(target + '.' + attribute, value, **flags)
+
+
+def build_shot(path, overrides, memory=False, pool_size=None):
+    """ Opens a scene, builds every flyer from its targets and saves it.
+
+    Args:
+        path (str): The scene file.
+        overrides (dict): {target: {attribute: value}} applied before building.
+        memory (bool): Treat path as a MemoryScene JSON file. Default False
+        pool_size (int): Worker threads for the numeric phase. Default None
+
+    Returns:
+        dict: The shot's path, flyer count, timings and any error.
+    """
+
+    start = time.perf_counter()
+    report = {'shot': path, 'flyers': 0, 'error': None}
+    try:
+        if memory:
+            scene = sc.load_memory_scene(path)
+        else:
+            scene = sc.open_maya_scene(path)
+        report['open_seconds'] = time.perf_counter() - start
+        apply_overrides(scene, overrides)
+        flyers = anim_sim.load_flyers(scene)
+        even = [flyer.name for flyer in flyers if (flyer.fidelity % 2) == 0]
+        if even:
+            raise ValueError('Fidelity value must be an odd number: %s' % ', '.join(even))
+        with instrument.BuildLog(scene) as build_log:
+            anim_sim.build_flyers(flyers, scene, pool_size=pool_size)
+        report['flyers'] = len(flyers)
+        report['build_seconds'] = build_log.seconds
+        report['build'] = build_log.totals()
+        save_start = time.perf_counter()
+        scene.save()
+        report['save_seconds'] = time.perf_counter() - save_start
+    except Exception as error:
+        LOG.exception('Failed to build %s', path)
+        report['error'] = '%s: %s' % (type(error).__name__, error)
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def _build_shot(args):
+    return build_shot(*args)
+
+
+#*******************************************************************************
+# RUN
+def parse_overrides(items):
+    """ Parses TARGET.ATTR=VALUE strings into {target: {attribute: value}}.
+
+    TARGET may be given with or without its _target suffix. Values are read
+    as Python literals where possible and as strings otherwise.
+
+    Args:
+        items (list): The override strings.
+
+    Returns:
+        dict: {target: {attribute: value}}
+    """
+
+    overrides = {}
+    for item in items or []:
+        plug, value = item.split('=', 1)
+        target, attribute = plug.rsplit('.', 1)
+        if not target.endswith('_target'):
+            target += '_target'
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        overrides.setdefault(target, {})[attribute] = value
+    return overrides
+
+
+def run(shots, overrides=None, processes=None, memory=False, pool_size=None):
+    """ Builds every shot on a pool of worker processes.
+
+    Args:
+        shots (list): Scene files.
+        overrides (dict): {target: {attribute: value}} for every shot.
+        processes (int): Worker processes. Default None (every core)
+        memory (bool): Shots are MemoryScene JSON files. Default False
+        pool_size (int): Worker threads per shot. Default None
+
+    Returns:
+        list: One report per shot, in shot order.
+    """
+
+    jobs = [(shot, overrides or {}, memory, pool_size) for shot in shots]
+    # Each worker builds one shot at a time and is replaced afterwards, so
+    # Maya's memory use does not grow across a long sequence.
+    pool = multiprocessing.Pool(processes, initializer=init_worker, initargs=(memory,),
+                                maxtasksperchild=1 if not memory else None)
+    try:
+        return pool.map(_build_shot, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild every animSim flyer in a list of scenes.')
+    parser.add_argument('shots', nargs='+', help='scene files to rebuild')
+    parser.add_argument('--set', dest='overrides', action='append', metavar='TARGET.ATTR=VALUE',
+                        help='override a target parameter in every shot, e.g. ship.fidelity=21')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes')
+    parser.add_argument('--threads', type=int, default=None, help='numeric worker threads per shot')
+    parser.add_argument('--memory', action='store_true', help='shots are in-memory scene JSON files')
+    parser.add_argument('--report', help='write per-shot timings to this JSON file')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reports = run(args.shots, parse_overrides(args.overrides), args.processes, args.memory, args.threads)
+    for report in reports:
+        if report['error']:
+            print('FAILED %s: %s' % (report['shot'], report['error']))
+        else:
+            print('%-40s %3d flyers %8.2fs (build %.2fs)' % (
+                report['shot'], report['flyers'], report['seconds'], report['build_seconds']))
+    print('%d shots in %.2fs' % (len(reports), time.perf_counter() - start))
+    if args.report:
+        with open(args.report, 'w') as handle:
+            json.dump(reports, handle, indent=2)
+    return 1 if any(report['error'] for report in reports) else 0
+
+
+#*******************************************************************************
+# START
+if __name__ == '__main__':
+    sys.exit(main())
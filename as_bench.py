@@ -0,0 +1,182 @@
+#*******************************************************************************
+# content = Benchmarks the animsim pipeline on synthetic flight curves.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => python as_bench.py --frames 100 10000 --flyers 1 100
+#
+# dependencies = numpy, scipy
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import anim_sim
+import helpers as h
+import scene as sc
+
+#*******************************************************************************
+# VARIABLES
+FRAMES = [100, 1000, 10000, 100000, 1000000]
+FLYERS = [1, 10, 100, 1000, 5000]
+FIDELITY = 15
+# Skip cases above this many flyer frames, the largest grid does not fit
+# in memory on a workstation.
+MAX_SAMPLES = 50000000
+STAGES = ['read', 'smooth', 'differentiate', 'fused', 'integrate', 'write']
+
+#*******************************************************************************
+# SCENE
+def build_scene(frames, flyers, seed=0):
+    """ Builds an in-memory scene of flyers on random smooth flight paths.
+
+    Args:
+        frames (int): The number of frames in the playback range.
+        flyers (int): The number of flyers.
+        seed (int): Random seed. Default 0
+
+    Returns:
+        tuple: (scene.MemoryScene, list of anim_sim.Flyer)
+    """
+
+    rng = np.random.RandomState(seed)
+    scene = sc.MemoryScene(1, frames)
+    times = np.arange(1 - FIDELITY, frames + FIDELITY + 1, dtype=float)
+    result = []
+    for idx in range(flyers):
+        name = 'flyer%d' % idx
+        scene.add_node(name)
+        for axis in 'XZ':
+            # A few slow sine waves plus a drift, like a hovering camera ship.
+            periods = rng.uniform(40, 400, 3)
+            amplitude = rng.uniform(1, 20, 3)
+            values = sum(a * np.sin(times / p) for a, p in zip(amplitude, periods))
+            scene.write_keys(name, 'translate' + axis, times, values + times * rng.uniform(-1, 1))
+        flyer = anim_sim.Flyer(name, scene)
+        flyer.fidelity = FIDELITY
+        flyer.Scale = 10
+        flyer.auto_roll = True
+        flyer.motion_plane = ['X', 'Z']
+        flyer.layer_name = name + '_Anim_Sim'
+        result.append(flyer)
+    return scene, result
+
+
+#*******************************************************************************
+# RUN
+def measure(function, reset=None):
+    """ Runs function twice, once timed and once traced for peak memory.
+
+    Tracing slows Python-heavy stages down, so the wall time comes from
+    the untraced run.
+
+    Args:
+        function (callable): The stage to run.
+        reset (callable): Called before each run, e.g. to empty a cache
+            the first run fills. Default None
+
+    Returns:
+        tuple: (result, seconds, peak traced bytes)
+    """
+
+    if reset:
+        reset()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    if reset:
+        reset()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_case(frames, flyers):
+    """ Times every pipeline stage for one size of shot.
+
+    Args:
+        frames (int): The number of frames in the shot.
+        flyers (int): The number of flyers.
+
+    Returns:
+        list: One result dictionary per stage.
+    """
+
+    # Nothing cached by the previous case is timed or traced in this one.
+    h.RAW_CACHE.clear()
+    h.SAVGOL_CACHE.clear()
+    scene, flyer_list = build_scene(frames, flyers)
+    for flyer in flyer_list:
+        flyer.get_scene_data()
+
+    def read():
+        return np.vstack([flyer.get_anim_data(['translateX', 'translateZ']) for flyer in flyer_list])
+
+    def write():
+        for idx, flyer in enumerate(flyer_list):
+            for row, axis in enumerate('ZX'):
+                scene.write_keys(flyer.name, 'rotate' + axis, flyer.key_frames,
+                                 accel[2 * idx + row], flyer.layer_name, -flyer.Scale)
+
+    raw, seconds, peak = measure(read, h.RAW_CACHE.clear)
+    timings = [('read', seconds, peak)]
+    pos, seconds, peak = measure(lambda: h.smooth_data(raw, FIDELITY, 3))
+    timings.append(('smooth', seconds, peak))
+    accel, seconds, peak = measure(lambda: h.get_derivative(pos, 2, True, FIDELITY))
+    timings.append(('differentiate', seconds, peak))
+    fused, seconds, peak = measure(lambda: h.smooth_and_derive(raw, FIDELITY, 3))
+    timings.append(('fused', seconds, peak))
+    integral, seconds, peak = measure(lambda: h.get_integral(accel, 2))
+    timings.append(('integrate', seconds, peak))
+    unused, seconds, peak = measure(write)
+    timings.append(('write', seconds, peak))
+
+    samples = raw.shape[1] * flyers
+    return [{'frames': frames, 'flyers': flyers, 'stage': stage, 'seconds': seconds,
+             'frames_per_second': samples / seconds if seconds else None,
+             'peak_bytes': peak}
+            for stage, seconds, peak in timings]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the animsim derive/integrate pipeline.')
+    parser.add_argument('--frames', type=int, nargs='+', default=FRAMES)
+    parser.add_argument('--flyers', type=int, nargs='+', default=FLYERS)
+    parser.add_argument('--max-samples', type=int, default=MAX_SAMPLES,
+                        help='skip cases with more flyer frames than this')
+    parser.add_argument('--output', default='as_bench.json', help='JSON results file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for frames in args.frames:
+        for flyers in args.flyers:
+            if frames * flyers > args.max_samples:
+                print('skip %8d frames x %5d flyers' % (frames, flyers))
+                continue
+            for record in run_case(frames, flyers):
+                results.append(record)
+                print('%8d frames x %5d flyers  %-14s %9.4fs %14.0f fps %10.1f MB' % (
+                    frames, flyers, record['stage'], record['seconds'],
+                    record['frames_per_second'] or 0, record['peak_bytes'] / 1e6))
+
+    report = {'python': sys.version.split()[0], 'numpy': np.__version__,
+              'machine': platform.machine(), 'fidelity': FIDELITY, 'results': results}
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print('Wrote %s' % args.output)
+
+
+#*******************************************************************************
+# START
+if __name__ == '__main__':
+    main()
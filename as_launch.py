@@ -10,17 +10,22 @@
 # author = Grae Revell <grae.revell@gmail.com>
 #*******************************************************************************
 
+import concurrent.futures
+import logging
+
 # Qt
 from Qt import QtWidgets, QtGui, QtCore, QtCompat
 from anim_sim import *
 
+import maya.cmds as cmds
+
 
 #*******************************************************************************
 # VARIABLES
-LAYER_NAME = 'Anim_Sim'
 TARGETS = 'Targets'
 ROOT_NAME = 'AnimSim'
 ROOT_TYPE = 'compound'
+LOG = logging.getLogger(h.LOG_NAME + '.as_launch')
 NUM_CHILDREN = 6
 NUM_ATTRIBUTES = {
             'fidelity': 'short',
@@ -32,6 +37,16 @@ STR_ATTRIBUTES = {
             'parent': 'string',
             'motion_plane': 'stringArray',
 }
+# Milliseconds without slider changes before a live preview is computed.
+PREVIEW_DELAY = 150
+
+#*******************************************************************************
+# PREVIEW
+class PreviewSignals(QtCore.QObject):
+    """ Carries preview results from the worker thread to the UI thread. """
+
+    finished = QtCore.Signal(object)
+
 
 #*******************************************************************************
 # UI
@@ -41,6 +56,18 @@ class AnimSim:
         self.target = ''
         self.target_group = TARGETS
         self.flyers = {}
+        self.scene = sc.MayaScene()
+
+        # Live preview: slider changes restart the timer, the numeric work
+        # runs on one worker thread and results are keyed on the UI thread.
+        self.preview_timer = QtCore.QTimer()
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self.start_preview)
+        self.preview_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.preview_signals = PreviewSignals()
+        self.preview_signals.finished.connect(self.finish_preview)
+        self.preview_generation = 0
 
         path_ui = CURRENT_PATH + "/" + TITLE + ".ui"
         self.wgAnimSim = QtCompat.loadUi(path_ui)
@@ -66,6 +93,7 @@ class AnimSim:
 
         self.wgAnimSim.sldScale.valueChanged.connect(self.press_sldScale)
         self.wgAnimSim.sldFidelity.valueChanged.connect(self.press_sldFidelity)
+        self.wgAnimSim.chkLivePreview.toggled.connect(self.press_chkLivePreview)
 
         # CONNECTIONS
         #self.wgAnimSim.wgConnectInputs.currentTextChanged.connect(self.wgConnections)
@@ -78,6 +106,7 @@ class AnimSim:
 
         # SIM
         self.wgAnimSim.btnBuild.clicked.connect(self.press_btnBuild)
+        self.wgAnimSim.btnBuildAll.clicked.connect(self.press_btnBuildAll)
 
         self.wgAnimSim.show()
         
@@ -108,7 +137,7 @@ class AnimSim:
             self.wgAnimSim.lblStatus.setText("Target already exists.")
         elif len(cmds.ls(sl=True)) == 1:
             self.make_flyer(self.selection)
-            print('self.selection is %s' % self.selection)
+            LOG.debug('self.selection is %s', self.selection)
             self.target = self.flyers[self.selection].name + '_target'
             h.create_dag(self.target, self.target_group)
             self.update_selections()
@@ -131,10 +160,23 @@ class AnimSim:
 
     def press_sldScale(self):
         self.wgAnimSim.lblScale.setText(str(self.wgAnimSim.sldScale.value()))
+        # Built flyers rescale live, no rebuild needed.
+        flyer = self.flyers.get(self.selection)
+        if flyer and flyer.rot_channels:
+            flyer.set_scale(self.wgAnimSim.sldScale.value())
 
 
     def press_sldFidelity(self):
         self.wgAnimSim.lblFidelity.setText(str(self.wgAnimSim.sldFidelity.value()))
+        if self.wgAnimSim.chkLivePreview.isChecked():
+            self.preview_timer.start()
+
+
+    def press_chkLivePreview(self, checked):
+        if checked:
+            self.preview_timer.start()
+        else:
+            self.cancel_preview()
 
 
     #def wgConnections(self):
@@ -144,47 +186,132 @@ class AnimSim:
     def press_btn_AddItem(self):
         if len(cmds.ls(sl=True)) >= 1:
             sel_objects = cmds.ls(sl=True)
-        print('sel_objects is:')
-        print(sel_objects)
+        LOG.debug('sel_objects is: %s', sel_objects)
         #for obj in sel_objects:
         self.wgAnimSim.wgConnections.addItems(sel_objects)
 
 
     def press_btnAddRemoveAnchor(self):
         current_time = self.flyers[self.selection].set_anchor(self.flyers[self.selection].motion_plane[0],self.flyers[self.selection].motion_plane[1])
+        if self.flyers[self.selection].correction is not None:
+            # Anchors already solved, only re-derive the frames the edit reaches.
+            self.flyers[self.selection].anchors_update(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1])
         if current_time:
             self.wgAnimSim.lblStatus.setText('Added anchor at frame: %s' % current_time)
         else:
             self.wgAnimSim.lblStatus.setText('anchor removed')
 
     def press_btnRemoveAllAnchor(self):
-        self.flyers[self.selection].remove_anchors()
+        # Rotation is derived again, with the parameters in the UI.
+        self.update_flyer_attrs()
+        removed = self.flyers[self.selection].remove_anchors()
+        self.wgAnimSim.lblStatus.setText('Removed %d anchor nodes and layers' % removed)
 
 
     def press_btnBuild(self):
+        self.cancel_preview()
         self.update_flyer_attrs()
         if (self.flyers[self.selection].fidelity % 2) == 0:
             self.wgAnimSim.lblStatus.setText('Fidelity value must be an odd number')
         else:
             target_name = self.flyers[self.selection].name + '_target'
-            self.flyers[self.selection].derive_rotation(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1], 3)
-            self.flyers[self.selection].integrate_translation(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1])
+            h.MATRIX_CACHE.clear()
+            with instrument.BuildLog(self.scene) as build_log:
+                self.flyers[self.selection].derive_rotation(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1], 3)
+                self.flyers[self.selection].integrate_translation(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1])
             self.write_parameters()
-            self.wgAnimSim.lblStatus.setText('Layer created: %s' % self.flyers[self.selection].layer_name)
+            build_log.write(instrument.log_path(self.scene.scene_path()))
+            self.wgAnimSim.lblStatus.setText('Layer created: %s (%s)' % (self.flyers[self.selection].layer_name, build_log.summary()))
+
+
+    def press_btnBuildAll(self):
+        self.cancel_preview()
+        self.update_flyer_attrs()
+        if self.wgAnimSim.cbxName.currentText():
+            self.write_parameters()
+        flyers = load_flyers(self.scene)
+        even = [flyer.name for flyer in flyers if (flyer.fidelity % 2) == 0]
+        if even:
+            self.wgAnimSim.lblStatus.setText('Fidelity value must be an odd number: %s' % ', '.join(even))
+        else:
+            with instrument.BuildLog(self.scene) as build_log:
+                build_flyers(flyers, self.scene)
+            for flyer in flyers:
+                self.flyers[flyer.name] = flyer
+            build_log.write(instrument.log_path(self.scene.scene_path()))
+            self.wgAnimSim.lblStatus.setText('Built %d flyers (%s)' % (len(flyers), build_log.summary()))
 
 
     def press_btnRebuild(self):
+        self.cancel_preview()
         self.flyers[self.selection].Scale = self.wgAnimSim.sldScale.value()
         self.flyers[self.selection].fidelity = self.wgAnimSim.sldFidelity.value()
         self.flyers[self.selection].auto_roll = self.wgAnimSim.chkAutoRoll.isChecked()       
-        self.flyers[self.selection].anchors_rebuild(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1])
+        with instrument.BuildLog(self.scene) as build_log:
+            self.flyers[self.selection].sync_anchors()
+            self.flyers[self.selection].anchors_rebuild(self.flyers[self.selection].motion_plane[0], self.flyers[self.selection].motion_plane[1])
+        build_log.write(instrument.log_path(self.scene.scene_path()))
+        self.wgAnimSim.lblStatus.setText('Anchors rebuilt (%s)' % build_log.summary())
+
+    #***************************************************************************
+    # PREVIEW
+    def cancel_preview(self, flyer=None):
+        """ Stops pending and running previews and removes the flyer's preview.
+
+        Args:
+            flyer (Flyer): The flyer to end the preview of. Default None
+                (the selected flyer)
+
+        Returns:
+            None
+        """
+
+        self.preview_timer.stop()
+        self.preview_generation += 1
+        flyer = flyer or self.flyers.get(self.selection)
+        if flyer:
+            flyer.end_preview()
+
+
+    def start_preview(self):
+        """ Samples the selected flyer and derives it on the preview worker. """
+
+        LOG.debug('|start_preview|')
+        self.update_flyer_attrs()
+        flyer = self.flyers.get(self.selection)
+        if not flyer:
+            return
+        # The slider can land on even values, the filter window must be odd.
+        flyer.fidelity |= 1
+        frames, raw = flyer.preview_samples()
+        self.preview_generation += 1
+        generation = self.preview_generation
+        future = self.preview_pool.submit(process_block, raw, flyer.fidelity, flyer.derive_method)
+        future.add_done_callback(
+            lambda future: self.preview_signals.finished.emit((generation, flyer, frames, future)))
+
+
+    def finish_preview(self, result):
+        """ Keys a finished preview unless a newer one has been started. """
+
+        generation, flyer, frames, future = result
+        if generation != self.preview_generation:
+            return
+        try:
+            vel, accel, integral = future.result()
+        except Exception:
+            LOG.exception('Preview of %s failed', flyer.name)
+            return
+        flyer.write_preview(frames, accel, integral)
+        self.wgAnimSim.lblStatus.setText('Preview: %s at fidelity %d' % (flyer.name, flyer.fidelity))
+
 
     #***************************************************************************
     # PROCESS   
     def make_flyer(self, dagObject):
-        print('|make_flyer|')
-        print('dagObject is %s' % dagObject)
-        self.flyers[dagObject] = Flyer(dagObject)
+        LOG.debug('|make_flyer|')
+        LOG.debug('dagObject is %s', dagObject)
+        self.flyers[dagObject] = Flyer(dagObject, self.scene)
         
         #setattr(self, 'foo', Flyer(dagObject))
         # if not self.flyer:
@@ -205,7 +332,7 @@ class AnimSim:
             None
             """     
 
-        print('|update_flyer_attrs|')
+        LOG.debug('|update_flyer_attrs|')
         if self.wgAnimSim.cbxName.currentText():
             self.selection = self.wgAnimSim.cbxName.currentText()
             try:
@@ -223,13 +350,16 @@ class AnimSim:
             self.flyers[self.selection].layer_name =  self.flyers[self.selection].name + '_' + LAYER_NAME
 
         else:
-            print('Selection box is empty. Nothing to update.')
+            LOG.info('Selection box is empty. Nothing to update.')
 
 
     def cbxName_changed(self):
         objects = cmds.listRelatives(TARGETS, children=True, fullPath=False)
         if objects:
+            outgoing = self.flyers.get(self.selection)
             self.selection = self.wgAnimSim.cbxName.currentText()
+            if outgoing and outgoing.name != self.selection:
+                self.cancel_preview(outgoing)
             self.read_parameters(self.wgAnimSim.cbxName.currentText())
 
 
@@ -242,7 +372,7 @@ class AnimSim:
         Returns:
             None
             """
-        print('|read_parameters|')
+        LOG.debug('|read_parameters|')
         motion_plane_list = {
             '[\'X\', \'Z\']': 0,
             '[\'X\', \'Y\']': 1,
@@ -269,7 +399,7 @@ class AnimSim:
             None
             """
 
-        print('|write_parameters|')
+        LOG.debug('|write_parameters|')
         cmds.setAttr(self.target + '.Name', self.flyers[self.selection].name, type='string')
         if self.flyers[self.selection].parent:
             cmds.setAttr(self.target + '.parent', self.flyers[self.selection].parent, type='string')
@@ -289,8 +419,7 @@ class AnimSim:
             None
             """
 
-        print('|update_selections|')
-        print('blah')
+        LOG.debug('|update_selections|')
         objects = cmds.listRelatives(TARGETS, children=True, fullPath=False)
         self.wgAnimSim.cbxName.clear()
         if objects:
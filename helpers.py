@@ -4,14 +4,33 @@
 # version      = 0.4.1
 # date         = 2023-05-13
 #
-# dependencies = Maya, numpy, scipy
+# dependencies = numpy, scipy (Maya for the hierarchy functions)
 #
 # author = Grae Revell <grae.revell@gmail.com>
 #*******************************************************************************
 
+import collections
+import glob
+import logging
+import os
+import re
+import tempfile
+import threading
+import zipfile
+
 import numpy as np
-import scipy.signal
-import maya.cmds as cmds
+import scipy.linalg
+import scipy.ndimage
+import scipy.sparse
+import scipy.spatial.transform
+
+import instrument
+
+try:
+    import maya.cmds as cmds
+except ImportError:
+    # The numeric helpers also run outside of Maya.
+    cmds = None
 
 #*******************************************************************************
 # VARIABLES
@@ -21,6 +40,308 @@ TARGETS = 'Targets'
 ANCHORS = 'Anchors'
 CONNECTIONS = 'Connections'
 
+LOG_NAME = 'animSim'
+LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s: %(message)s'
+LOG = logging.getLogger(LOG_NAME + '.helpers')
+# Silent unless set_logging is called.
+logging.getLogger(LOG_NAME).addHandler(logging.NullHandler())
+logging.getLogger(LOG_NAME).setLevel(logging.WARNING)
+
+SAVGOL_CACHE_SIZE = 64
+MATRIX_CACHE_SIZE = 16
+RAW_CACHE_SIZE = 256
+RAW_CACHE_BYTES = 512 * 1024 * 1024
+DISK_CACHE_BYTES = 1024 * 1024 * 1024
+DISK_CACHE_SUFFIX = '_animSim_cache'
+# Weight of the first difference in anchor_correction. Keeps the curve flat
+# outside the first and last anchor.
+ANCHOR_RIDGE = 1e-3
+
+CHANNELS = ('translateX', 'translateY', 'translateZ', 'rotateX', 'rotateY', 'rotateZ')
+# Maya's rotateOrder enum, first applied axis first.
+ROTATE_ORDERS = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')
+
+#*******************************************************************************
+# CACHE
+
+class LRUCache:
+    """ Bounded mapping that evicts the least recently used entry.
+
+    Safe to share between threads. With max_bytes set, entries are also
+    evicted while the NumPy arrays they hold exceed that many bytes.
+
+    Args:
+        maxsize (int): The maximum number of entries to keep.
+        max_bytes (int): The maximum total array size. Default None
+    """
+
+    def __init__(self, maxsize, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """ Returns the cached value for key, building it with factory on a miss.
+
+        Args:
+            key (hashable): The cache key.
+            factory (callable): Builds the value when key is not cached.
+
+        Returns:
+            The cached value.
+        """
+
+        value = self.lookup(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """ Returns the cached value for key, or None on a miss. """
+
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """ Stores value under key and evicts entries over the limits. """
+
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= _nbytes(self._data.pop(key))
+            self._data[key] = value
+            self.nbytes += _nbytes(value)
+            while len(self._data) > self.maxsize or (
+                    self.max_bytes is not None and self.nbytes > self.max_bytes and len(self._data) > 1):
+                self.nbytes -= _nbytes(self._data.popitem(last=False)[1])
+
+    def invalidate(self, match):
+        """ Removes every entry whose key match(key) returns True for.
+
+        Args:
+            match (callable): Called with each key.
+
+        Returns:
+            int: The number of entries removed.
+        """
+
+        with self._lock:
+            keys = [key for key in self._data if match(key)]
+            for key in keys:
+                self.nbytes -= _nbytes(self._data.pop(key))
+        return len(keys)
+
+    def clear(self):
+        """ Removes every entry and resets the counters. """
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.nbytes = 0
+
+    def info(self):
+        """ Returns a dictionary of hits, misses, current size and limits. """
+
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                'maxsize': self.maxsize, 'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class DiskCache:
+    """ Compressed .npz files in one directory, evicted least recently used.
+
+    Each entry is a dictionary of arrays stored as <name>_<key>.npz. Reading
+    an entry touches its modification time, and writing one removes the
+    oldest files while the directory holds more than max_bytes. Files are
+    written to a temporary name and renamed, so several processes can
+    share a directory.
+
+    Args:
+        path (str): The cache directory, created on the first store.
+        max_bytes (int): The maximum total file size. Default DISK_CACHE_BYTES
+    """
+
+    def __init__(self, path, max_bytes=DISK_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def file_path(self, name, key):
+        """ Returns the file of an entry. Node names are made file safe. """
+
+        return os.path.join(self.path, '%s_%s.npz' % (_file_safe(name), key))
+
+    def load(self, name, key):
+        """ Returns {array name: np.ndarray} for an entry, or None on a miss.
+
+        Args:
+            name (str): The target name.
+            key (str): The hex key of the entry.
+
+        Returns:
+            dict: The stored arrays, or None.
+        """
+
+        path = self.file_path(name, key)
+        try:
+            with np.load(path) as data:
+                arrays = dict((item, data[item]) for item in data.files)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            LOG.warning('Removing unreadable cache file %s', path)
+            _remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def store(self, name, key, **arrays):
+        """ Writes an entry and evicts the least recently used files.
+
+        Args:
+            name (str): The target name.
+            key (str): The hex key of the entry.
+            **arrays: The arrays to store.
+
+        Returns:
+            str: The file written.
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+        path = self.file_path(name, key)
+        handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        with os.fdopen(handle, 'wb') as temp:
+            np.savez_compressed(temp, **arrays)
+        os.replace(temp_path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """ Removes the oldest files until the directory fits max_bytes.
+
+        Returns:
+            int: The number of files removed.
+        """
+
+        files = []
+        for path in glob.glob(os.path.join(self.path, '*.npz')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in files)
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def invalidate(self, name):
+        """ Removes every entry of a target.
+
+        Returns:
+            int: The number of files removed.
+        """
+
+        pattern = re.compile(re.escape(_file_safe(name)) + r'_[0-9a-f]+\.npz$')
+        paths = [path for path in glob.glob(os.path.join(self.path, '*.npz'))
+                 if pattern.match(os.path.basename(path))]
+        for path in paths:
+            _remove(path)
+        return len(paths)
+
+    def info(self):
+        """ Returns a dictionary of hits, misses, file count and total bytes. """
+
+        sizes = [os.path.getsize(path) for path in glob.glob(os.path.join(self.path, '*.npz'))]
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(sizes),
+                'nbytes': sum(sizes), 'max_bytes': self.max_bytes}
+
+
+def _file_safe(name):
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def cache_dir(scene_path):
+    """ Returns the disk cache directory next to a scene file.
+
+    Args:
+        scene_path (str): The scene file, or None for an untitled scene.
+
+    Returns:
+        str: The directory, or None for untitled scenes.
+    """
+
+    if not scene_path:
+        return None
+    return os.path.splitext(scene_path)[0] + DISK_CACHE_SUFFIX
+
+
+SAVGOL_CACHE = LRUCache(SAVGOL_CACHE_SIZE)
+# Parent samples shared by every flyer of a build. Cleared per build.
+MATRIX_CACHE = LRUCache(MATRIX_CACHE_SIZE)
+# Raw flyer samples, keyed by the content of their source animation.
+RAW_CACHE = LRUCache(RAW_CACHE_SIZE, RAW_CACHE_BYTES)
+
+#*******************************************************************************
+# FUNCTIONS
+
+def set_logging(level=logging.DEBUG, path=None):
+    """ Sets the level of every animSim logger and optionally logs to a file.
+
+    Args:
+        level (int): A logging level. Default logging.DEBUG
+        path (str): A file to write log records to. Default None
+
+    Returns:
+        None
+    """
+
+    logger = logging.getLogger(LOG_NAME)
+    logger.setLevel(level)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.FileHandler):
+            logger.removeHandler(handler)
+            handler.close()
+    if path:
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+
+
 def create_hierarchy():
     """ Creates initial folder structre
     
@@ -51,11 +372,9 @@ def create_dag(object, parent_node):
 
     if not cmds.objExists(object):
         cmds.createNode('dagContainer', n=object, parent=parent_node)
-        print('Created dag node:')
-        print(object)
+        LOG.debug('Created dag node: %s', object)
     else:
-        print('Node already exists:')
-        print(object)
+        LOG.debug('Node already exists: %s', object)
 
 # def add_attrs(object, name, type, typeType, parent_attr):
 #     if typeType == 'attributeType':
@@ -63,92 +382,321 @@ def create_dag(object, parent_node):
 #     else:
 #         cmds.addAttr(object, longName=name, dataType=type, parent=parent_attr)
 
+@instrument.stage
 def get_derivative(anim_data, degree, filter_data, window, order=3):
-    """ Returns a list containing n degree derivative of supplied list.
-    
+    """ Returns an array containing the n degree derivative of the supplied data.
+
+    The data may be a single channel or a 2-D (channels x frames) block, in
+    which case every channel is derived along the frame axis at once. The
+    first frame of each differencing pass is padded with zero.
+
     Args:
-        anim_data (list): The data to get derivatives from.
+        anim_data (list or np.ndarray): The data to get derivatives from.
         degree (int): The number of derivatives to calculate.
         filter_data (bool): Option to smooth the data after deriving.
         window (int): The filter window size.
         order (int): The filter polynomial order. Default 3
 
     Returns:
-        list: The n degree derivative of anim_data
+        np.ndarray: The n degree derivative of anim_data
         """
 
-    print('|get_derivative|')
-    # Initialize data
-    data_to_derive = anim_data
-    deriv_result = []
-    count = 1
-    while count <= degree:
-        deriv_result = np.diff(data_to_derive)        
-        deriv_result = np.insert(deriv_result,0,0)
-        data_to_derive = deriv_result
-        count = count + 1
+    LOG.debug('|get_derivative|')
+    # Ping-pong between two buffers so no pass reallocates the block.
+    deriv_result = np.array(anim_data, dtype=float)
+    scratch = np.empty_like(deriv_result)
+    for count in range(degree):
+        np.subtract(deriv_result[..., 1:], deriv_result[..., :-1], out=scratch[..., 1:])
+        scratch[..., 0] = 0
+        deriv_result, scratch = scratch, deriv_result
     if filter_data == True:
-        deriv_result = scipy.signal.savgol_filter(deriv_result, window, order)            
+        deriv_result = apply_savgol(deriv_result, savgol_kernels(window, order)[0])
     return deriv_result
 
 
-def get_integral(anim_data, degree):
-    """ Returns a list containing the n degree integral of the supplied list.
-    
+@instrument.stage
+def get_integral(anim_data, degree, initial=None):
+    """ Returns an array containing the n degree integral of the supplied data.
+
+    The data may be a single channel or a 2-D (channels x frames) block, in
+    which case every channel is integrated along the frame axis at once.
+
     Args:
-        anim_data (list): The data to get derivatives from.
-        degree (int): The number of derivatives to calculate.
+        anim_data (list or np.ndarray): The data to integrate.
+        degree (int): The number of integrals to calculate.
+        initial (list): Optional constant of integration for each degree.
+            Each entry is a scalar or one value per channel. Default None
 
     Returns:
-        list: The n degree integral of anim_data
+        np.ndarray: The n degree integral of anim_data
     """
 
-    print('|get_integral|')
+    LOG.debug('|get_integral|')
 
     # velocity(t) - velocity(t - 1) = acceleration(t)
     # velocity(t) = acceleration(t) + velocity(t -1)
 
-    data_to_integrate = anim_data      
-    count = 1
-    while count <= degree:
-        #print('Getting integral of degree: '+ str(count))
-        # Initialize integral_result.
-        integral_result = []
-        # Append the first value in data_to_integrate to integral_result's first element     
-        integral_result.append(data_to_integrate[0])
-        for idx, i in enumerate(data_to_integrate):
-            if idx > 0:
-                integral_result.append(data_to_integrate[idx] + integral_result[idx - 1])
-        count = count + 1
-        data_to_integrate = integral_result
-    return integral_result 
+    integral_result = np.array(anim_data, dtype=float)
+    for count in range(degree):
+        np.cumsum(integral_result, axis=-1, out=integral_result)
+        if initial is not None:
+            integral_result += np.asarray(initial[count], dtype=float)[..., np.newaxis]
+    return integral_result
 
 
+@instrument.stage
 def smooth_data(data, window, order):
     """ Smooths list of numbers using Savitzky-Golay filter.
     
     Args:
-        data (list): The numbers to smooth.
+        data (list or np.ndarray): The numbers to smooth, either a single
+            channel or a 2-D (channels x frames) block.
         window (int): The smoothing window size.
         order (int): The polynomial order to use in the smoothing method.
     Returns:
         list: Smoothed data.
     """
 
-    print('|smooth_data|')
+    LOG.debug('|smooth_data|')
 
-    return scipy.signal.savgol_filter(data, window, order) 
+    return apply_savgol(data, savgol_kernels(window, order)[0])
 
 
-def create_anim_layer(object, layer_name, override):
-    """ Creates an animation layer
-    
+def savgol_kernels(window, order, deriv=0, delta=1.0):
+    """ Returns Savitzky-Golay kernels for every window position.
+
+    One least-squares polynomial fit is shared by all derivative orders, so
+    the smoothed data and its derivatives come from the same set of kernels.
+    Row [d, i] evaluates derivative d of the fitted polynomial at window
+    position i; the centre row is the usual convolution kernel and the
+    other rows reproduce savgol_filter's 'interp' mode at the edges.
+    Kernels are cached by their parameters.
+
+    Args:
+        window (int): The filter window size. Must be odd.
+        order (int): The filter polynomial order.
+        deriv (int): The highest derivative order to build. Default 0
+        delta (float): The sample spacing. Default 1.0
+
+    Returns:
+        np.ndarray: Read-only (deriv + 1, window, window) array of
+            dot-product kernels, shared through SAVGOL_CACHE.
+    """
+
+    key = (window, order, deriv, delta)
+    return SAVGOL_CACHE.get(key, lambda: _build_savgol_kernels(window, order, deriv, delta))
+
+
+def _build_savgol_kernels(window, order, deriv, delta):
+    if window % 2 == 0 or order >= window:
+        raise ValueError('Filter window must be odd and larger than the polynomial order.')
+    half = window // 2
+    offsets = np.arange(window, dtype=float) - half
+    fit = np.linalg.pinv(np.vander(offsets, order + 1, increasing=True))
+    kernels = np.zeros((deriv + 1, window, window))
+    powers = np.arange(order + 1)
+    for d in range(deriv + 1):
+        # d-th derivative of u**j is j! / (j - d)! * u**(j - d)
+        falling = np.ones(order + 1)
+        for k in range(d):
+            falling *= powers - k
+        exponents = np.clip(powers - d, 0, None)
+        terms = falling * offsets[:, np.newaxis] ** exponents
+        kernels[d] = terms.dot(fit) / delta ** d
+    kernels.setflags(write=False)
+    return kernels
+
+
+def apply_savgol(data, kernels):
+    """ Filters data along the frame axis with a row of savgol_kernels.
+
     Args:
-        layer_name (str): The name of layer to be created
+        data (np.ndarray): Single channel or (channels x frames) block.
+        kernels (np.ndarray): (window, window) kernels for one derivative.
+
+    Returns:
+        np.ndarray: The filtered data.
+    """
+
+    data = np.asarray(data, dtype=float)
+    window = kernels.shape[0]
+    half = window // 2
+    if data.shape[-1] < window:
+        raise ValueError('Filter window is larger than the number of frames.')
+    result = scipy.ndimage.correlate1d(data, kernels[half], axis=-1, mode='constant')
+    result[..., :half] = data[..., :window].dot(kernels[:half].T)
+    result[..., -half:] = data[..., -window:].dot(kernels[half + 1:].T)
+    return result
+
+
+@instrument.stage
+def smooth_and_derive(data, window, order=3, delta=1.0):
+    """ Returns smoothed position, velocity and acceleration in one stage.
+
+    Replaces smooth_data followed by get_derivative and a second filter with
+    Savitzky-Golay derivative kernels applied to the raw samples.
+
+    Args:
+        data (list or np.ndarray): Single channel or (channels x frames) block.
+        window (int): The filter window size.
+        order (int): The filter polynomial order. Default 3
+        delta (float): The sample spacing. Default 1.0
+
+    Returns:
+        tuple: (position, velocity, acceleration) arrays shaped like data.
+    """
+
+    LOG.debug('|smooth_and_derive|')
+    kernels = savgol_kernels(window, order, 2, delta)
+    return tuple(apply_savgol(data, kernels[d]) for d in range(3))
+
+
+@instrument.stage
+def anchor_correction(count, anchors, offsets, ridge=ANCHOR_RIDGE):
+    """ Returns minimum acceleration curves that pass through anchor offsets.
+
+    Minimises the squared second difference of each curve, plus ridge times
+    its squared first difference, while matching every anchor exactly. The
+    anchored frames are eliminated, which leaves a symmetric pentadiagonal
+    system over the free frames that solveh_banded solves in linear time.
+    Outside the first and last anchor each curve holds the outer anchor's
+    offset instead of carrying its slope on. The frame beyond each outer
+    anchor is pinned to its offset too, so the curve arrives there with
+    zero slope and joins the hold smoothly.
+
+    Args:
+        count (int): The number of frames.
+        anchors (np.ndarray): Sorted, unique frame indices of the anchors.
+        offsets (np.ndarray): (channels x anchors) values to match.
+        ridge (float): The first difference weight. Default ANCHOR_RIDGE
+
+    Returns:
+        np.ndarray: (channels x count) correction curves.
+    """
+
+    LOG.debug('|anchor_correction|')
+    anchors = np.asarray(anchors, dtype=int)
+    offsets = np.atleast_2d(np.asarray(offsets, dtype=float))
+    result = np.zeros((offsets.shape[0], count))
+    if not len(anchors):
+        return result
+    result[:, :anchors[0]] = offsets[:, :1]
+    result[:, anchors[-1]:] = offsets[:, -1:]
+    result[:, anchors] = offsets
+    # Pin zero slope at the outer anchors, where the range allows.
+    if anchors[0] > 0:
+        anchors = np.append(anchors[0] - 1, anchors)
+        offsets = np.hstack([offsets[:, :1], offsets])
+    if anchors[-1] < count - 1:
+        anchors = np.append(anchors, anchors[-1] + 1)
+        offsets = np.hstack([offsets, offsets[:, -1:]])
+    start = anchors[0]
+    anchors = anchors - start
+    count = anchors[-1] + 1
+    free = np.setdiff1d(np.arange(count), anchors)
+    if not len(free):
+        return result
+    first = scipy.sparse.diags([-1.0, 1.0], [0, 1], shape=(count - 1, count))
+    system = ridge * (first.T @ first)
+    if count > 2:
+        second = scipy.sparse.diags([1.0, -2.0, 1.0], [0, 1, 2], shape=(count - 2, count))
+        system = system + second.T @ second
+    rows = system.tocsr()[free]
+    rhs = -(rows[:, anchors] @ offsets.T)
+    reduced = rows[:, free]
+    band = np.zeros((3, len(free)))
+    band[2] = reduced.diagonal(0)
+    band[1, 1:] = reduced.diagonal(1)
+    band[0, 2:] = reduced.diagonal(2)
+    result[:, start + free] = scipy.linalg.solveh_banded(band, rhs).T
+    return result
+
+
+def sample_parent_matrices(scene, node, times, source_hash=None):
+    """ Returns a parent's world matrices, sampling it once per build.
+
+    Flyers that share a parent reuse the samples held in MATRIX_CACHE,
+    which the build clears before it starts. Pass the parent's source hash
+    when the cache may outlive a build, so edits to the parent miss.
+
+    Args:
+        scene (scene.Scene): The scene to sample.
+        node (str): The parent node.
+        times (np.ndarray): The frames to evaluate.
+        source_hash (str): The parent's Scene.source_hash. Default None
+
+    Returns:
+        np.ndarray: Read-only (frames x 4 x 4) world matrices.
+    """
+
+    key = (id(scene), node, source_hash, times[0], times[-1], len(times))
+
+    def sample():
+        matrices = scene.sample_matrices(node, times)
+        matrices.setflags(write=False)
+        return matrices
+
+    return MATRIX_CACHE.get(key, sample)
+
+
+def to_parent_space(matrices, parent_matrices):
+    """ Converts world matrices into the space of a parent, frame by frame.
+
+    Args:
+        matrices (np.ndarray): (frames x 4 x 4) world matrices.
+        parent_matrices (np.ndarray): (frames x 4 x 4) parent world matrices.
+
+    Returns:
+        np.ndarray: (frames x 4 x 4) parent relative matrices.
+    """
+
+    return np.matmul(matrices, np.linalg.inv(parent_matrices))
+
+
+def decompose_matrices(matrices, rotate_order=0):
+    """ Splits matrices into translate and euler rotate channels.
+
+    Args:
+        matrices (np.ndarray): (frames x 4 x 4) row-vector matrices.
+        rotate_order (int): Maya rotateOrder of the result. Default 0 (xyz)
+
+    Returns:
+        np.ndarray: (6 x frames) block ordered as CHANNELS, rotations in degrees.
+    """
+
+    translate = matrices[:, 3, :3]
+    # Remove scale, then transpose into column-vector convention. Maya's
+    # rotate orders match scipy's extrinsic (lower case) sequences.
+    axes = matrices[:, :3, :3]
+    axes = axes / np.linalg.norm(axes, axis=2)[:, :, np.newaxis]
+    rotation = scipy.spatial.transform.Rotation.from_matrix(np.transpose(axes, (0, 2, 1)))
+    rotate = rotation.as_euler(ROTATE_ORDERS[rotate_order], degrees=True)
+    # as_euler returns angles in sequence order, put them back in x, y, z.
+    order = ROTATE_ORDERS[rotate_order]
+    rotate = rotate[:, [order.index(axis) for axis in 'xyz']]
+    return np.ascontiguousarray(np.hstack([translate, rotate]).T)
+
+
+def compose_matrices(block, rotate_order=0):
+    """ Builds matrices from translate and euler rotate channels.
+
+    The inverse of decompose_matrices, without scale.
+
+    Args:
+        block (np.ndarray): (6 x frames) block ordered as CHANNELS, rotations
+            in degrees.
+        rotate_order (int): Maya rotateOrder of the rotations. Default 0 (xyz)
+
+    Returns:
+        np.ndarray: (frames x 4 x 4) row-vector matrices.
     """
 
-    print('|create_anim_layer|')
-    if not cmds.animLayer(layer_name, query=True, exists=True):
-        cmds.animLayer(layer_name)
-    cmds.select(object)
-    cmds.animLayer(layer_name, edit=True, addSelectedObjects=True, o=override)
+    block = np.asarray(block, dtype=float)
+    order = ROTATE_ORDERS[rotate_order]
+    angles = block[[3 + 'xyz'.index(axis) for axis in order]].T
+    rotation = scipy.spatial.transform.Rotation.from_euler(order, angles, degrees=True)
+    matrices = np.zeros((block.shape[1], 4, 4))
+    matrices[:, :3, :3] = np.transpose(rotation.as_matrix(), (0, 2, 1))
+    matrices[:, 3, :3] = block[:3].T
+    matrices[:, 3, 3] = 1.0
+    return matrices
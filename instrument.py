@@ -0,0 +1,173 @@
+#*******************************************************************************
+# content = Per-stage timing and scene access counters for animsim builds.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => with BuildLog(scene) as log: flyer.derive_rotation(...)
+#
+# dependencies = None
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import collections
+import datetime
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+#*******************************************************************************
+# VARIABLES
+COUNTERS = ('keys_read', 'keys_written', 'samples_read')
+LOG_SUFFIX = '_animSim_build.json'
+
+_ACTIVE = {'log': None}
+
+#*******************************************************************************
+# LOG
+class BuildLog:
+    """ Records wall time and scene access for every stage of a build.
+
+    Stages are functions decorated with stage(). While the log is active
+    (used as a context manager) each call records its wall time, the cmds
+    calls it issued by command name and the keys it read and wrote, taken
+    from the scene's counters. Nested stages are recorded with their depth
+    and include the work of the stages they call.
+
+    Args:
+        scene (scene.Scene): The scene whose counters are recorded.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.stages = []
+        self.started = None
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+        self._previous = None
+        self._start = None
+        self._thread = None
+
+    def __enter__(self):
+        self._previous = _ACTIVE['log']
+        _ACTIVE['log'] = self
+        self._thread = threading.current_thread().name
+        self.started = datetime.datetime.now().isoformat()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        _ACTIVE['log'] = self._previous
+        return False
+
+    def record(self, name, function, *args, **kwargs):
+        """ Calls function as the stage called name and records it. """
+
+        depth = getattr(self._depth, 'value', 0)
+        self._depth.value = depth + 1
+        before = collections.Counter(self.scene.counters)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self._depth.value = depth
+            counts = collections.Counter(self.scene.counters)
+            counts.subtract(before)
+            entry = {'stage': name, 'depth': depth, 'seconds': seconds,
+                     'thread': threading.current_thread().name,
+                     'commands': dict((key[5:], value) for key, value in counts.items()
+                                      if key.startswith('cmds.') and value)}
+            for counter in COUNTERS:
+                entry[counter] = counts[counter]
+            with self._lock:
+                self.stages.append(entry)
+
+    def totals(self):
+        """ Returns the summed counts of the top level stages.
+
+        Stages run on worker threads overlap the stage that started them,
+        so only stages on the thread that opened the log are summed.
+        """
+
+        totals = {'seconds': 0.0, 'commands': 0}
+        for counter in COUNTERS:
+            totals[counter] = 0
+        for entry in self.stages:
+            if entry['depth'] or entry['thread'] != self._thread:
+                continue
+            totals['seconds'] += entry['seconds']
+            totals['commands'] += sum(entry['commands'].values())
+            for counter in COUNTERS:
+                totals[counter] += entry[counter]
+        return totals
+
+    def summary(self):
+        """ Returns a one line summary for the status bar. """
+
+        totals = self.totals()
+        slowest = max((entry for entry in self.stages
+                       if entry['depth'] == 0 and entry['thread'] == self._thread),
+                      key=lambda entry: entry['seconds'], default=None)
+        text = '%.2fs, %d cmds, %d keys read, %d keys written' % (
+            self.seconds, totals['commands'], totals['keys_read'] + totals['samples_read'],
+            totals['keys_written'])
+        if slowest:
+            text += ', slowest: %s %.2fs' % (slowest['stage'], slowest['seconds'])
+        return text
+
+    def write(self, path):
+        """ Writes the log as JSON.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            str: path
+        """
+
+        data = {'started': self.started, 'seconds': self.seconds,
+                'totals': self.totals(), 'stages': self.stages}
+        with open(path, 'w') as handle:
+            json.dump(data, handle, indent=2)
+        return path
+
+
+#*******************************************************************************
+# FUNCTIONS
+def active_log():
+    """ Returns the active BuildLog, or None. """
+
+    return _ACTIVE['log']
+
+
+def stage(function):
+    """ Decorator that records calls to function in the active BuildLog. """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        log = active_log()
+        if log is None:
+            return function(*args, **kwargs)
+        return log.record(function.__name__, function, *args, **kwargs)
+    return wrapper
+
+
+def log_path(scene_path):
+    """ Returns the build log path next to a scene file.
+
+    Args:
+        scene_path (str): The scene file, or None for an untitled scene.
+
+    Returns:
+        str: The JSON log path, in the temp directory for untitled scenes.
+    """
+
+    if not scene_path:
+        return os.path.join(tempfile.gettempdir(), 'untitled' + LOG_SUFFIX)
+    return os.path.splitext(scene_path)[0] + LOG_SUFFIX
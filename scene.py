@@ -0,0 +1,843 @@
+#*******************************************************************************
+# content = Scene access backends for animsim.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => scene = MayaScene() or scene = MemoryScene()
+#
+# dependencies = numpy, scipy (Maya for MayaScene)
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import collections
+import contextlib
+import hashlib
+import json
+import logging
+
+import numpy as np
+
+import helpers as h
+
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+except ImportError:
+    cmds = None
+
+#*******************************************************************************
+# VARIABLES
+
+LOG = logging.getLogger(h.LOG_NAME + '.scene')
+MATRIX_ATTRS = ('worldMatrix[0]', 'worldInverseMatrix[0]', 'matrix', 'parentMatrix[0]')
+
+#*******************************************************************************
+# INTERFACE
+class Scene:
+    """ Everything the animsim pipeline needs from a scene.
+
+    Flyer and the build only talk to a Scene, so the same pipeline runs
+    against Maya or against the in-memory scene outside of a Maya session.
+    Backends count their work in self.counters: 'cmds.<command>' per Maya
+    command, plus 'keys_read', 'keys_written' and 'samples_read'.
+    """
+
+    def __init__(self):
+        self.counters = collections.Counter()
+
+    def scene_path(self):
+        """ Returns the scene file path, or None for an untitled scene. """
+        raise NotImplementedError
+
+    def save(self, path=None):
+        """ Saves the scene, to path if given. """
+        raise NotImplementedError
+
+    # TIME
+    def playback_range(self):
+        """ Returns the (start, end) playback frames as ints. """
+        raise NotImplementedError
+
+    def current_time(self):
+        """ Returns the current frame. """
+        raise NotImplementedError
+
+    # NODES
+    def obj_exists(self, node):
+        """ Returns True if the node or layer exists. """
+        raise NotImplementedError
+
+    def list_children(self, node):
+        """ Returns the names of a node's children, or an empty list. """
+        raise NotImplementedError
+
+    def create_group(self, name, parent=None):
+        """ Creates an empty transform. """
+        raise NotImplementedError
+
+    def create_locator(self, name, parent, position):
+        """ Creates a locator under parent at a world space position. """
+        raise NotImplementedError
+
+    def delete(self, nodes):
+        """ Deletes nodes and layers. """
+        raise NotImplementedError
+
+    def existing(self, nodes):
+        """ Returns the nodes and layers of nodes that exist, in one query. """
+        raise NotImplementedError
+
+    def add_to_display_layer(self, layer, nodes):
+        """ Adds nodes to a templated display layer, creating it if needed. """
+        raise NotImplementedError
+
+    # ATTRIBUTES
+    def get_attr(self, plug, time=None):
+        """ Returns a plug's value, at time if given. """
+        raise NotImplementedError
+
+    def set_attr(self, plug, value, **flags):
+        """ Sets a plug's value. Flags are passed on as cmds.setAttr flags. """
+        raise NotImplementedError
+
+    def get_array(self, plug):
+        """ Returns a doubleArray attribute as an np.ndarray, or None if missing. """
+        raise NotImplementedError
+
+    def set_array(self, plug, values):
+        """ Sets a doubleArray attribute, adding it to the node if needed. """
+        raise NotImplementedError
+
+    # KEYS
+    def write_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        """ Replaces a channel's curve, on layer if given, with the given keys. """
+        raise NotImplementedError
+
+    def splice_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        """ Replaces a channel's keys from times[0] to times[-1], keeping the rest. """
+        raise NotImplementedError
+
+    def scale_channel(self, node, attribute, factor, layer=None):
+        """ Multiplies a keyed channel by factor live, without rewriting keys. """
+        raise NotImplementedError
+
+    def sample_matrices(self, node, times, attribute='worldMatrix[0]'):
+        """ Returns (frames x 4 x 4) row-vector matrices evaluated at times. """
+        raise NotImplementedError
+
+    def source_hash(self, node, exclude=None):
+        """ Returns a hex digest of the animation driving node's world matrix.
+
+        Curves on the animation layers in exclude are left out.
+        """
+        raise NotImplementedError
+
+    def sample_many(self, nodes, times):
+        """ Returns {node: (frames x 4 x 4) world matrices} for several nodes. """
+        return dict((node, self.sample_matrices(node, times)) for node in nodes)
+
+    @contextlib.contextmanager
+    def undo_chunk(self, name):
+        """ Groups everything done inside the block into one undo step. """
+        yield
+
+    # LAYERS
+    def layer_exists(self, layer):
+        """ Returns True if the animation layer exists. """
+        raise NotImplementedError
+
+    def create_layer(self, node, layer, override):
+        """ Creates an animation layer if needed and adds node to it. """
+        raise NotImplementedError
+
+    def delete_layer(self, layer):
+        """ Deletes an animation layer with everything scale_channel added to it. """
+        self.delete(layer)
+
+    def mute_layer(self, layer, mute=True):
+        """ Mutes or unmutes an animation layer. """
+        raise NotImplementedError
+
+    def set_active_layer(self, layer):
+        """ Makes layer the only selected and preferred animation layer. """
+        raise NotImplementedError
+
+    def move_layer_after(self, layer, other):
+        """ Moves layer so it evaluates after other. """
+        raise NotImplementedError
+
+
+#*******************************************************************************
+# MAYA
+class CountingCmds:
+    """ Wraps maya.cmds and counts every command call by name.
+
+    Args:
+        module (module): maya.cmds
+        counters (collections.Counter): Incremented as 'cmds.<command>'.
+    """
+
+    def __init__(self, module, counters):
+        self._module = module
+        self._counters = counters
+
+    def __getattr__(self, name):
+        function = getattr(self._module, name)
+        counters = self._counters
+
+        def counted(*args, **kwargs):
+            counters['cmds.' + name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+
+class MayaScene(Scene):
+    """ Scene backed by the running Maya session. """
+
+    def __init__(self):
+        Scene.__init__(self)
+        self.cmds = CountingCmds(cmds, self.counters)
+
+    def scene_path(self):
+        return self.cmds.file(query=True, sceneName=True) or None
+
+    def save(self, path=None):
+        if path:
+            self.cmds.file(rename=path)
+        self.cmds.file(save=True, force=True)
+
+    def playback_range(self):
+        return (int(self.cmds.playbackOptions(min=True, q=True)),
+                int(self.cmds.playbackOptions(max=True, q=True)))
+
+    def current_time(self):
+        return self.cmds.currentTime(query=True)
+
+    def obj_exists(self, node):
+        return self.cmds.objExists(node)
+
+    def list_children(self, node):
+        if not self.cmds.objExists(node):
+            return []
+        return self.cmds.listRelatives(node) or []
+
+    def create_group(self, name, parent=None):
+        flags = {'parent': parent} if parent else {}
+        return self.cmds.group(empty=True, name=name, **flags)
+
+    def create_locator(self, name, parent, position):
+        locator = self.cmds.spaceLocator(name=name)[0]
+        if parent:
+            locator = self.cmds.parent(locator, parent)[0]
+        self.cmds.xform(locator, worldSpace=True, translation=[float(value) for value in position])
+        return locator
+
+    def delete(self, nodes):
+        self.cmds.delete(nodes)
+
+    def existing(self, nodes):
+        return self.cmds.ls(nodes) or []
+
+    def add_to_display_layer(self, layer, nodes):
+        if not self.cmds.objExists(layer):
+            self.cmds.createDisplayLayer(name=layer, empty=True)
+        self.cmds.editDisplayLayerMembers(layer, nodes, noRecurse=True)
+        self.cmds.setAttr(layer + '.displayType', 1)
+
+    def get_attr(self, plug, time=None):
+        if time is None:
+            return self.cmds.getAttr(plug)
+        return self.cmds.getAttr(plug, time=time)
+
+    def set_attr(self, plug, value, **flags):
+        self.cmds.setAttr(plug, value, **flags)
+
+    def get_array(self, plug):
+        node, attribute = plug.split('.', 1)
+        if not self.cmds.attributeQuery(attribute, node=node, exists=True):
+            return None
+        return np.array(self.cmds.getAttr(plug) or [], dtype=float)
+
+    def set_array(self, plug, values):
+        node, attribute = plug.split('.', 1)
+        if not self.cmds.attributeQuery(attribute, node=node, exists=True):
+            self.cmds.addAttr(node, longName=attribute, dataType='doubleArray')
+        self.cmds.setAttr(plug, np.asarray(values, dtype=float).tolist(), type='doubleArray')
+
+    def write_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        """ Replaces a channel's curve with the given keys in one undoable call.
+
+        Every key is written by a single setAttr on the curve's keyTimeValue
+        array, so the keys are undone and redone with the rest of an
+        undo_chunk.
+
+        Args:
+            node (str): The node to key.
+            attribute (str): The attribute to key, e.g. 'rotateZ'.
+            times (list or np.ndarray): Key times in the current time unit.
+            values (list or np.ndarray): Key values in UI units.
+            layer (str): The animation layer to key. Default None (base layer)
+            multiplier (float): Scale and sign applied to every value. Default 1.0
+
+        Returns:
+            str: The name of the animation curve that was written.
+        """
+
+        LOG.debug('|write_keys|')
+        values = np.asarray(values, dtype=float) * multiplier
+        curve = self._keyed_curve(node, attribute, times, values, layer)
+        self._set_keys(curve, np.asarray(times, dtype=float), values)
+        return curve
+
+    def splice_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        """ Replaces the keys of a channel between two times in one call.
+
+        Keys outside times[0] to times[-1] are kept, so a changed span can be
+        rewritten without touching the rest of a long curve. The curve's keys
+        are read with one query and written back with one undoable setAttr.
+
+        Args:
+            node (str): The node to key.
+            attribute (str): The attribute to key, e.g. 'rotateZ'.
+            times (list or np.ndarray): Sorted key times in the current time unit.
+            values (list or np.ndarray): Key values in UI units.
+            layer (str): The animation layer to key. Default None (base layer)
+            multiplier (float): Scale and sign applied to every value. Default 1.0
+
+        Returns:
+            str: The name of the animation curve that was written.
+        """
+
+        LOG.debug('|splice_keys|')
+        values = np.asarray(values, dtype=float) * multiplier
+        curve = self._keyed_curve(node, attribute, times, values, layer)
+        times = np.asarray(times, dtype=float)
+        pairs = self.cmds.keyframe(curve, query=True, timeChange=True, valueChange=True)
+        pairs = np.array(pairs or [], dtype=float).reshape(-1, 2)
+        self.counters['keys_read'] += len(pairs)
+        keep = (pairs[:, 0] < times[0]) | (pairs[:, 0] > times[-1])
+        idx = np.searchsorted(pairs[keep, 0], times[0])
+        self._set_keys(curve, np.insert(pairs[keep, 0], idx, times), np.insert(pairs[keep, 1], idx, values))
+        return curve
+
+    def _keyed_curve(self, node, attribute, times, values, layer):
+        plug = node + '.' + attribute
+        curve = self.find_anim_curve(plug, layer)
+        if not curve:
+            # A single key creates the curve, on the layer if one is given.
+            flags = {'animLayer': layer} if layer else {}
+            self.cmds.setKeyframe(node, attribute=attribute, time=times[0], value=values[0], **flags)
+            curve = self.find_anim_curve(plug, layer)
+        return curve
+
+    def _set_keys(self, curve, times, values):
+        # Every key but the first is cut, as a curve left without keys is
+        # deleted. The setAttr then overwrites that key and appends the rest,
+        # in UI units like a scene file. Both commands are undoable.
+        count = self.cmds.keyframe(curve, query=True, keyframeCount=True) or 0
+        if count > 1:
+            self.cmds.cutKey(curve, index=(1, count - 1), option='keys', clear=True)
+        pairs = np.empty(2 * len(values))
+        pairs[0::2] = times
+        pairs[1::2] = values
+        self.cmds.setAttr('%s.ktv[0:%d]' % (curve, len(values) - 1), *pairs.tolist())
+        self.counters['keys_written'] += len(values)
+
+    def find_anim_curve(self, plug, layer=None):
+        """ Returns the animation curve driving a plug, on a layer if given.
+
+        Args:
+            plug (str): The plug, e.g. 'pCube1.rotateZ'.
+            layer (str): The animation layer. Default None (base layer)
+
+        Returns:
+            str: The curve name or None when the plug is not animated.
+        """
+
+        if layer:
+            curves = self.cmds.animLayer(layer, query=True, findCurveForPlug=plug)
+        else:
+            curves = self.cmds.listConnections(plug, source=True, destination=False, type='animCurve')
+        if curves:
+            return curves[0]
+        return None
+
+    def scale_channel(self, node, attribute, factor, layer=None):
+        """ Scales a channel through a multDoubleLinear after its curve.
+
+        The node is inserted between the curve and everything it drives the
+        first time, and only its input2 changes after that, so the viewport
+        updates without new keys. Rewriting the curve with write_keys keeps
+        the connection.
+
+        Args:
+            node (str): The keyed node.
+            attribute (str): The channel, e.g. 'rotateZ'.
+            factor (float): The multiplier.
+            layer (str): The animation layer of the curve. Default None
+
+        Returns:
+            str: The multDoubleLinear node, or None when the plug has no curve.
+        """
+
+        curve = self.find_anim_curve(node + '.' + attribute, layer)
+        if not curve:
+            return None
+        mults = self.cmds.listConnections(curve + '.output', source=False, destination=True,
+                                          type='multDoubleLinear', skipConversionNodes=True)
+        if mults:
+            mult = mults[0]
+        else:
+            destinations = self.cmds.listConnections(curve + '.output', source=False, destination=True,
+                                                      plugs=True, skipConversionNodes=True) or []
+            mult = self.cmds.createNode('multDoubleLinear', name=curve + '_scale')
+            self.cmds.connectAttr(curve + '.output', mult + '.input1')
+            for plug in destinations:
+                self.cmds.connectAttr(mult + '.output', plug, force=True)
+        self.cmds.setAttr(mult + '.input2', factor)
+        return mult
+
+    def sample_matrices(self, node, times, attribute='worldMatrix[0]'):
+        """ Evaluates a matrix attribute at every given time.
+
+        Uses time-context evaluation, so the current time never changes and no
+        nodes or keys are created.
+
+        Args:
+            node (str): The node to sample.
+            times (list or np.ndarray): The frames to evaluate.
+            attribute (str): The matrix attribute. Default 'worldMatrix[0]'
+
+        Returns:
+            np.ndarray: (frames x 4 x 4) matrices in Maya's row-vector layout.
+        """
+
+        LOG.debug('|sample_matrices|')
+        plug = node + '.' + attribute
+        matrices = np.empty((len(times), 16))
+        for idx, time in enumerate(times):
+            matrices[idx] = self.cmds.getAttr(plug, time=time)
+        self.counters['samples_read'] += len(times)
+        return matrices.reshape(-1, 4, 4)
+
+    def sample_many(self, nodes, times):
+        """ Samples the world matrices of several nodes in one time sweep.
+
+        Every plug is read through the API under one DG context per frame,
+        instead of a getAttr that builds its own time context per plug, so
+        all the nodes share each frame's evaluation. Neither the current
+        time nor the scene changes.
+
+        Args:
+            nodes (list): The nodes to sample.
+            times (list or np.ndarray): The frames to evaluate.
+
+        Returns:
+            dict: {node: (frames x 4 x 4) world matrices}
+        """
+
+        LOG.debug('|sample_many|')
+        selection = om.MSelectionList()
+        for node in nodes:
+            selection.add(node + '.worldMatrix[0]')
+        plugs = [selection.getPlug(row) for row in range(len(nodes))]
+        time_unit = om.MTime.uiUnit()
+        matrices = np.empty((len(nodes), len(times), 16))
+        for idx, time in enumerate(times):
+            context = om.MDGContext(om.MTime(time, time_unit))
+            for row, plug in enumerate(plugs):
+                matrices[row, idx] = tuple(om.MFnMatrixData(plug.asMObject(context)).matrix())
+        self.counters['samples_read'] += len(nodes) * len(times)
+        return dict((node, matrices[row].reshape(-1, 4, 4)) for row, node in enumerate(nodes))
+
+    def source_hash(self, node, exclude=None):
+        """ Hashes every animation curve upstream of node and its ancestors.
+
+        Keys, and then their tangent angles and weights, are read in one
+        query each for all curves. The world matrix at the first playback
+        frame stands in for static values.
+
+        Args:
+            node (str): The node.
+            exclude (list): Animation layers whose curves are left out,
+                muted while sampling. Default None
+
+        Returns:
+            str: A hex digest that changes when the node's motion can change.
+        """
+
+        LOG.debug('|source_hash|')
+        chain = self.cmds.ls(node, long=True)[0].split('|')[1:]
+        curves = set(self.cmds.ls(self.cmds.listHistory(chain) or [], type='animCurve'))
+        for layer in exclude or []:
+            if self.layer_exists(layer):
+                curves.difference_update(self.cmds.animLayer(layer, query=True, animCurves=True) or [])
+        curves = sorted(curves)
+        digest = hashlib.sha1()
+        digest.update(repr(curves).encode())
+        if curves:
+            keys = self.cmds.keyframe(curves, query=True, timeChange=True, valueChange=True)
+            digest.update(np.array(keys or [], dtype=float).tobytes())
+            tangents = self.cmds.keyTangent(curves, query=True, inAngle=True, outAngle=True,
+                                            inWeight=True, outWeight=True)
+            digest.update(np.array(tangents or [], dtype=float).tobytes())
+        start = self.playback_range()[0]
+        matrix = self.cmds.getAttr(node + '.worldMatrix[0]', time=start)
+        digest.update(np.array(matrix, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    @contextlib.contextmanager
+    def undo_chunk(self, name):
+        self.cmds.undoInfo(openChunk=True, chunkName=name)
+        try:
+            yield
+        finally:
+            self.cmds.undoInfo(closeChunk=True)
+
+    def layer_exists(self, layer):
+        return self.cmds.animLayer(layer, query=True, exists=True)
+
+    def create_layer(self, node, layer, override):
+        LOG.debug('|create_layer|')
+        if not self.cmds.animLayer(layer, query=True, exists=True):
+            self.cmds.animLayer(layer)
+        self.cmds.select(node)
+        self.cmds.animLayer(layer, edit=True, addSelectedObjects=True, o=override)
+
+    def delete_layer(self, layer):
+        # The scale_channel multipliers outlive the layer's curves otherwise.
+        curves = self.cmds.animLayer(layer, query=True, animCurves=True) or []
+        mults = []
+        if curves:
+            mults = self.cmds.listConnections(curves, source=False, destination=True,
+                                              type='multDoubleLinear', skipConversionNodes=True) or []
+        self.cmds.delete(sorted(set(mults)) + [layer])
+
+    def mute_layer(self, layer, mute=True):
+        self.cmds.animLayer(layer, edit=True, mute=mute)
+
+    def set_active_layer(self, layer):
+        for other in self.cmds.ls(type='animLayer'):
+            self.cmds.animLayer(other, edit=True, sel=False, prf=False)
+        self.cmds.animLayer(layer, edit=True, sel=True, prf=True)
+
+    def move_layer_after(self, layer, other):
+        self.cmds.animLayer(layer, edit=True, moveLayerAfter=other)
+
+
+#*******************************************************************************
+# MEMORY
+class MemoryScene(Scene):
+    """ Pure Python / NumPy scene for headless runs and benchmarks.
+
+    Nodes hold static attribute values and base layer curves (time and value
+    arrays, held constant outside their range). Animation layers are
+    evaluated in order: override layers replace the channels they key,
+    additive layers add to them, both scaled by the layer weight.
+
+    Args:
+        start (int): First playback frame. Default 1
+        end (int): Last playback frame. Default 120
+    """
+
+    def __init__(self, start=1, end=120):
+        Scene.__init__(self)
+        self.path = None
+        self.start = start
+        self.end = end
+        self.time = float(start)
+        self.nodes = collections.OrderedDict()
+        self.curves = {}
+        # Live multipliers set by scale_channel, keyed like curves.
+        self.scales = {}
+        self.layers = collections.OrderedDict()
+        self.display_layers = {}
+        self.active_layer = None
+
+    def scene_path(self):
+        return self.path
+
+    def save(self, path=None):
+        """ Writes the scene as JSON, to path or to the path it was loaded from. """
+
+        self.path = path or self.path
+        data = {'start': self.start, 'end': self.end, 'time': self.time,
+                'nodes': self.nodes, 'layers': self.layers,
+                'display_layers': self.display_layers,
+                'curves': [[node, attribute, layer, times.tolist(), values.tolist()]
+                           for (node, attribute, layer), (times, values) in self.curves.items()],
+                'scales': [[node, attribute, layer, factor]
+                           for (node, attribute, layer), factor in self.scales.items()]}
+        with open(self.path, 'w') as handle:
+            json.dump(data, handle, default=_to_json)
+
+    # BUILD
+    def add_node(self, name, parent=None, rotate_order=0):
+        """ Adds a transform node.
+
+        Args:
+            name (str): The node name.
+            parent (str): The parent node. Default None
+            rotate_order (int): Maya rotateOrder enum value. Default 0 (xyz)
+
+        Returns:
+            str: The node name.
+        """
+
+        if parent and parent not in self.nodes:
+            raise ValueError('No object matches name: %s' % parent)
+        self.nodes[name] = {'parent': parent, 'attrs': {'rotateOrder': rotate_order}}
+        return name
+
+    # TIME
+    def playback_range(self):
+        return (int(self.start), int(self.end))
+
+    def current_time(self):
+        return self.time
+
+    # NODES
+    def obj_exists(self, node):
+        return node in self.nodes or node in self.layers or node in self.display_layers
+
+    def list_children(self, node):
+        return [name for name, data in self.nodes.items() if data['parent'] == node]
+
+    def create_group(self, name, parent=None):
+        return self.add_node(name, parent)
+
+    def create_locator(self, name, parent, position):
+        self.add_node(name, parent)
+        point = np.append(np.asarray(position, dtype=float), 1.0)
+        if parent:
+            point = point.dot(np.linalg.inv(self.sample_matrices(parent, [self.time])[0]))
+        for axis, value in zip('XYZ', point[:3]):
+            self.nodes[name]['attrs']['translate' + axis] = value
+        return name
+
+    def delete(self, nodes):
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        for node in nodes:
+            if node in self.layers:
+                del self.layers[node]
+                for key in [key for key in self.curves if key[2] == node]:
+                    del self.curves[key]
+                    self.scales.pop(key, None)
+            elif node in self.display_layers:
+                del self.display_layers[node]
+            elif node in self.nodes:
+                for child in self.list_children(node):
+                    self.delete(child)
+                del self.nodes[node]
+                for key in [key for key in self.curves if key[0] == node]:
+                    del self.curves[key]
+                    self.scales.pop(key, None)
+            else:
+                raise ValueError('No object matches name: %s' % node)
+
+    def existing(self, nodes):
+        return [node for node in nodes
+                if node in self.nodes or node in self.layers or node in self.display_layers]
+
+    def add_to_display_layer(self, layer, nodes):
+        if isinstance(nodes, str):
+            nodes = [nodes]
+        members = self.display_layers.setdefault(layer, {'members': set(), 'displayType': 1})
+        members['members'].update(nodes)
+
+    # ATTRIBUTES
+    def get_attr(self, plug, time=None):
+        node, attribute = plug.split('.', 1)
+        if attribute in MATRIX_ATTRS:
+            matrices = self.sample_matrices(node, [self.time if time is None else time], attribute)
+            return matrices[0].ravel().tolist()
+        if node in self.layers or node in self.display_layers:
+            layer = self.layers.get(node) or self.display_layers[node]
+            return layer[attribute]
+        if attribute not in h.CHANNELS:
+            return self.nodes[node]['attrs'].get(attribute)
+        return float(self.evaluate(node, attribute, [self.time if time is None else time])[0])
+
+    def set_attr(self, plug, value, **flags):
+        node, attribute = plug.split('.', 1)
+        if node in self.layers or node in self.display_layers:
+            layer = self.layers.get(node) or self.display_layers[node]
+            layer[attribute] = value
+        else:
+            self.nodes[node]['attrs'][attribute] = value
+
+    def get_array(self, plug):
+        node, attribute = plug.split('.', 1)
+        values = self.nodes[node]['attrs'].get(attribute)
+        return None if values is None else np.array(values, dtype=float)
+
+    def set_array(self, plug, values):
+        node, attribute = plug.split('.', 1)
+        self.nodes[node]['attrs'][attribute] = np.asarray(values, dtype=float).tolist()
+
+    # KEYS
+    def write_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        times = np.array(times, dtype=float)
+        values = np.asarray(values, dtype=float) * multiplier
+        self.curves[(node, attribute, layer)] = (times, values)
+        self.counters['keys_written'] += len(values)
+        return '%s_%s' % (node, attribute)
+
+    def splice_keys(self, node, attribute, times, values, layer=None, multiplier=1.0):
+        times = np.array(times, dtype=float)
+        values = np.asarray(values, dtype=float) * multiplier
+        old_times, old_values = self.curves.get((node, attribute, layer), (np.empty(0), np.empty(0)))
+        before = old_times < times[0]
+        after = old_times > times[-1]
+        self.curves[(node, attribute, layer)] = (
+            np.concatenate([old_times[before], times, old_times[after]]),
+            np.concatenate([old_values[before], values, old_values[after]]))
+        self.counters['keys_written'] += len(values)
+        return '%s_%s' % (node, attribute)
+
+    def scale_channel(self, node, attribute, factor, layer=None):
+        if (node, attribute, layer) not in self.curves:
+            return None
+        self.scales[(node, attribute, layer)] = float(factor)
+        return '%s_%s_scale' % (node, attribute)
+
+    def evaluate(self, node, attribute, times, exclude=None):
+        """ Evaluates a channel through the base curve and every layer.
+
+        Args:
+            node (str): The node.
+            attribute (str): The channel, e.g. 'translateX'.
+            times (list or np.ndarray): The frames to evaluate.
+            exclude (str): A layer to leave out. Default None
+
+        Returns:
+            np.ndarray: The channel values at times.
+        """
+
+        times = np.asarray(times, dtype=float)
+        curve = self.curves.get((node, attribute, None))
+        if curve is not None:
+            result = np.interp(times, curve[0], curve[1]) * self.scales.get((node, attribute, None), 1.0)
+        else:
+            result = np.full(len(times), float(self.nodes[node]['attrs'].get(attribute, 0.0)))
+        for layer, data in self.layers.items():
+            if layer == exclude or data['mute'] or node not in data['members']:
+                continue
+            curve = self.curves.get((node, attribute, layer))
+            if curve is None:
+                continue
+            values = np.interp(times, curve[0], curve[1]) * self.scales.get((node, attribute, layer), 1.0)
+            if data['override']:
+                result = result + data['weight'] * (values - result)
+            else:
+                result = result + data['weight'] * values
+        return result
+
+    def sample_matrices(self, node, times, attribute='worldMatrix[0]'):
+        times = np.asarray(times, dtype=float)
+        self.counters['samples_read'] += len(times)
+        parent = self.nodes[node]['parent']
+        if attribute == 'parentMatrix[0]':
+            if parent:
+                return self.sample_matrices(parent, times)
+            return np.tile(np.eye(4), (len(times), 1, 1))
+        block = np.array([self.evaluate(node, channel, times) for channel in h.CHANNELS])
+        matrices = h.compose_matrices(block, self.nodes[node]['attrs'].get('rotateOrder', 0))
+        if attribute == 'matrix':
+            return matrices
+        if parent:
+            matrices = np.matmul(matrices, self.sample_matrices(parent, times))
+        if attribute == 'worldInverseMatrix[0]':
+            matrices = np.linalg.inv(matrices)
+        return matrices
+
+    def source_hash(self, node, exclude=None):
+        digest = hashlib.sha1()
+        while node:
+            digest.update(repr((node, sorted(self.nodes[node]['attrs'].items()))).encode())
+            for (curve_node, attribute, layer), (times, values) in sorted(
+                    self.curves.items(), key=lambda item: repr(item[0])):
+                if curve_node != node:
+                    continue
+                if layer is not None:
+                    if layer in (exclude or []):
+                        continue
+                    data = self.layers[layer]
+                    if data['mute'] or node not in data['members']:
+                        continue
+                    digest.update(repr((layer, data['override'], data['weight'])).encode())
+                digest.update(repr((attribute, self.scales.get((curve_node, attribute, layer)))).encode())
+                digest.update(times.tobytes())
+                digest.update(values.tobytes())
+            node = self.nodes[node]['parent']
+        return digest.hexdigest()
+
+    # LAYERS
+    def layer_exists(self, layer):
+        return layer in self.layers
+
+    def create_layer(self, node, layer, override):
+        if layer not in self.layers:
+            self.layers[layer] = {'override': override, 'mute': False, 'weight': 1.0, 'members': set()}
+        self.layers[layer]['members'].add(node)
+
+    def mute_layer(self, layer, mute=True):
+        self.layers[layer]['mute'] = mute
+
+    def set_active_layer(self, layer):
+        self.active_layer = layer
+
+    def move_layer_after(self, layer, other):
+        data = self.layers.pop(layer)
+        layers = list(self.layers.items())
+        idx = [name for name, _ in layers].index(other) + 1
+        layers.insert(idx, (layer, data))
+        self.layers = collections.OrderedDict(layers)
+
+
+#*******************************************************************************
+# FUNCTIONS
+def open_maya_scene(path):
+    """ Opens a Maya scene file and returns a MayaScene for it. """
+
+    cmds.file(path, open=True, force=True)
+    return MayaScene()
+
+
+def load_memory_scene(path):
+    """ Loads a MemoryScene written by MemoryScene.save.
+
+    Args:
+        path (str): The JSON scene file.
+
+    Returns:
+        MemoryScene: The loaded scene.
+    """
+
+    with open(path) as handle:
+        data = json.load(handle)
+    scene = MemoryScene(data['start'], data['end'])
+    scene.path = path
+    scene.time = data['time']
+    scene.nodes = collections.OrderedDict(data['nodes'])
+    for name, layer in data['layers'].items():
+        layer['members'] = set(layer['members'])
+        scene.layers[name] = layer
+    for name, layer in data['display_layers'].items():
+        layer['members'] = set(layer['members'])
+        scene.display_layers[name] = layer
+    for node, attribute, layer, times, values in data['curves']:
+        scene.curves[(node, attribute, layer)] = (np.array(times), np.array(values))
+    for node, attribute, layer, factor in data.get('scales', []):
+        scene.scales[(node, attribute, layer)] = factor
+    return scene
+
+
+def _to_json(value):
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Cannot write %r to a scene file.' % value)
@@ -0,0 +1,17 @@
+#*******************************************************************************
+# content = Puts the animsim modules on sys.path for the tests.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => pytest
+#
+# dependencies = pytest
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import os
+import sys
+
+# The modules import each other by name, like the Maya scripts folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,144 @@
+#*******************************************************************************
+# content = Checks the numeric helpers against scipy and the original loops.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => pytest -q
+#
+# dependencies = numpy, scipy, pytest
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import numpy as np
+import pytest
+import scipy.signal
+
+import helpers as h
+
+#*******************************************************************************
+# VARIABLES
+FRAMES = 200
+# (window, polynomial order) pairs, including the build default.
+FILTERS = ((15, 3), (9, 2), (21, 4), (5, 3))
+
+
+#*******************************************************************************
+# REFERENCES
+def make_block(channels=3, frames=FRAMES, seed=0):
+    """ Returns a (channels x frames) block of noisy flight curves. """
+
+    rng = np.random.RandomState(seed)
+    t = np.arange(frames, dtype=float)
+    curves = [10 * np.sin(t / rng.uniform(10, 40)) + rng.uniform(-1, 1) * t for _ in range(channels)]
+    return np.array(curves) + rng.normal(0, 0.2, (channels, frames))
+
+
+def loop_derivative(data, degree):
+    """ The original get_derivative: np.diff, padded with a leading zero. """
+
+    for count in range(degree):
+        data = np.insert(np.diff(data), 0, 0)
+    return data
+
+
+def loop_integral(data, degree):
+    """ The original get_integral: a running sum in a Python loop. """
+
+    for count in range(degree):
+        result = [data[0]]
+        for idx in range(1, len(data)):
+            result.append(data[idx] + result[idx - 1])
+        data = result
+    return np.array(data)
+
+
+#*******************************************************************************
+# TESTS
+@pytest.mark.parametrize('window, order', FILTERS)
+@pytest.mark.parametrize('deriv', (0, 1, 2))
+def test_savgol_kernels_match_scipy(window, order, deriv):
+    data = make_block()
+    kernels = h.savgol_kernels(window, order, deriv)
+    expected = scipy.signal.savgol_filter(data, window, order, deriv=deriv, mode='interp')
+    np.testing.assert_allclose(h.apply_savgol(data, kernels[deriv]), expected, rtol=0, atol=1e-10)
+
+
+def test_smooth_data_matches_scipy():
+    data = make_block()
+    np.testing.assert_allclose(h.smooth_data(data, 15, 3), scipy.signal.savgol_filter(data, 15, 3),
+                               rtol=0, atol=1e-10)
+    np.testing.assert_allclose(h.smooth_data(data[0], 15, 3), scipy.signal.savgol_filter(data[0], 15, 3),
+                               rtol=0, atol=1e-10)
+
+
+def test_smooth_and_derive_matches_scipy():
+    data = make_block()
+    pos, vel, accel = h.smooth_and_derive(data, 15, 3, delta=0.5)
+    for deriv, result in enumerate((pos, vel, accel)):
+        expected = scipy.signal.savgol_filter(data, 15, 3, deriv=deriv, delta=0.5)
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('degree', (1, 2))
+def test_get_derivative_matches_loop(degree):
+    data = make_block()
+    block = h.get_derivative(data, degree, False, 15)
+    for channel, values in zip(block, data):
+        np.testing.assert_allclose(channel, loop_derivative(values, degree), rtol=0, atol=1e-12)
+    filtered = h.get_derivative(data, degree, True, 15)
+    expected = [scipy.signal.savgol_filter(loop_derivative(values, degree), 15, 3) for values in data]
+    np.testing.assert_allclose(filtered, expected, rtol=0, atol=1e-10)
+
+
+@pytest.mark.parametrize('degree', (1, 2))
+def test_get_integral_matches_loop(degree):
+    data = make_block()
+    block = h.get_integral(data, degree)
+    for channel, values in zip(block, data):
+        np.testing.assert_allclose(channel, loop_integral(values, degree), rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(h.get_integral(data[0], degree), block[0])
+
+
+def test_get_integral_initial_values():
+    data = make_block(channels=2)
+    initial = [[1.0, -2.0], 3.0]
+    result = h.get_integral(data, 2, initial)
+    for channel, values in enumerate(data):
+        first = np.cumsum(values) + initial[0][channel]
+        np.testing.assert_allclose(result[channel], np.cumsum(first) + initial[1], rtol=1e-12, atol=1e-9)
+
+
+def test_savgol_kernels_reject_bad_windows():
+    with pytest.raises(ValueError):
+        h.savgol_kernels(14, 3)
+    with pytest.raises(ValueError):
+        h.savgol_kernels(3, 3)
+
+
+def test_lru_cache_evicts_by_count():
+    cache = h.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.lookup('a') == 1
+    cache.put('c', 3)
+    assert cache.lookup('b') is None
+    assert cache.lookup('a') == 1 and cache.lookup('c') == 3
+
+
+def test_lru_cache_evicts_by_bytes():
+    cache = h.LRUCache(10, max_bytes=3 * 800)
+    for key in 'abc':
+        cache.put(key, np.zeros(100))
+    assert cache.nbytes == 2400 and len(cache) == 3
+    cache.lookup('a')
+    cache.put('d', (np.zeros(50), np.zeros(50)))
+    assert cache.lookup('b') is None
+    assert [key for key in 'acd' if cache.lookup(key) is not None] == ['a', 'c', 'd']
+    assert cache.nbytes == 2400
+
+    # One entry over the limit is still kept, alone.
+    cache.put('e', np.zeros(1000))
+    assert len(cache) == 1 and cache.lookup('e') is not None
+    assert cache.invalidate(lambda key: key == 'e') == 1
+    assert cache.nbytes == 0
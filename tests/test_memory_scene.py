@@ -0,0 +1,256 @@
+#*******************************************************************************
+# content = Headless checks of the build and anchor paths on a MemoryScene.
+#
+# version      = 0.1.0
+# date         = 2026-10-16
+# how to       => pytest -q
+#
+# dependencies = numpy, scipy, pytest
+#
+# author = Grae Revell <grae.revell@gmail.com>
+#*******************************************************************************
+
+import numpy as np
+
+import anim_sim
+import as_batch
+import helpers as h
+import scene as sc
+
+#*******************************************************************************
+# VARIABLES
+START, END = 1, 200
+ANCHOR_FRAMES = (10, 40, 75, 120)
+# (fidelity, parent, motion plane) of each flyer in make_fleet.
+FLEET = ((15, None, 'XZ'), (15, 'carrier', 'XZ'), (9, None, 'XY'), (15, None, 'YZ'))
+
+
+#*******************************************************************************
+# SCENES
+def make_scene():
+    """ Returns a scene with a flyer 'ship' under an animated 'rig'. """
+
+    scene = sc.MemoryScene(START, END)
+    scene.add_node(h.ROOT)
+    scene.add_node(h.TARGETS, h.ROOT)
+    t = np.arange(START - 30, END + 50, dtype=float)
+    scene.add_node('rig')
+    scene.write_keys('rig', 'translateX', t, t * 0.5)
+    scene.write_keys('rig', 'rotateY', t, t * 0.2)
+    scene.add_node('ship', 'rig')
+    scene.write_keys('ship', 'translateX', t, 10 * np.sin(t / 20))
+    scene.write_keys('ship', 'translateY', t, 3 * np.cos(t / 13))
+    scene.write_keys('ship', 'translateZ', t, t * 0.3)
+    scene.add_node('ship_target', h.TARGETS)
+    params = dict(parent=None, motionPlane="['X', 'Z']", fidelity=15, Scale=10, auto_roll=True)
+    for attr, value in params.items():
+        scene.set_attr('ship_target.' + attr, value)
+    return scene
+
+
+def make_fleet():
+    """ Returns a scene with a flyer per FLEET entry and a 'carrier' parent. """
+
+    scene = sc.MemoryScene(START, END)
+    scene.add_node(h.ROOT)
+    scene.add_node(h.TARGETS, h.ROOT)
+    t = np.arange(START - 30, END + 50, dtype=float)
+    scene.add_node('carrier')
+    scene.write_keys('carrier', 'translateX', t, t * 0.5)
+    scene.write_keys('carrier', 'rotateY', t, t * 0.2)
+    for i, (fidelity, parent, plane) in enumerate(FLEET):
+        name = 'ship_%d' % i
+        scene.add_node(name)
+        scene.write_keys(name, 'translateX', t, 10 * np.sin(t / (20 + i)))
+        scene.write_keys(name, 'translateY', t, 3 * np.cos(t / (13 + i)))
+        scene.write_keys(name, 'translateZ', t, t * 0.3)
+        scene.add_node(name + '_target', h.TARGETS)
+        params = dict(parent=parent, motionPlane=str(list(plane)), fidelity=fidelity, Scale=10 + i, auto_roll=True)
+        for attr, value in params.items():
+            scene.set_attr(name + '_target.' + attr, value)
+    return scene
+
+
+def build_one_by_one(scene):
+    """ Builds every flyer in scene through the single flyer path. """
+
+    for flyer in anim_sim.load_flyers(scene):
+        flyer.derive_rotation(*flyer.motion_plane)
+        flyer.integrate_translation(*flyer.motion_plane)
+
+
+def add_anchors(flyer, frames):
+    """ Anchors the flyer where it is on frames. """
+
+    for frame in frames:
+        flyer.scene.time = float(frame)
+        flyer.set_anchor(*flyer.motion_plane)
+
+
+def layer_curves(scene, flyer):
+    """ Returns copies of the flyer's rotation and anchor layer curves. """
+
+    layers = (flyer.layer_name, flyer.anchor_layer)
+    return {key: values.copy() for key, (times, values) in scene.curves.items()
+            if key[0] == flyer.name and key[2] in layers}
+
+
+def assert_same_curves(a, b):
+    assert set(a) == set(b)
+    for key in a:
+        np.testing.assert_allclose(a[key], b[key], atol=1e-6, err_msg=str(key))
+
+
+def all_curves(scene):
+    return dict((key, values) for key, (times, values) in scene.curves.items())
+
+
+def dense_correction(count, anchors, offsets, ridge=h.ANCHOR_RIDGE):
+    """ Solves anchor_correction's problem over every frame with dense matrices.
+
+    The anchors and the held frames outside them are fixed, the rest free.
+    """
+
+    anchors = np.asarray(anchors)
+    first = np.diff(np.eye(count), 1, axis=0)
+    second = np.diff(np.eye(count), 2, axis=0)
+    system = ridge * first.T.dot(first) + second.T.dot(second)
+    frames = np.arange(count)
+    fixed = (frames <= anchors[0]) | (frames >= anchors[-1]) | np.isin(frames, anchors)
+    result = np.empty((len(offsets), count))
+    for channel, values in enumerate(offsets):
+        curve = np.interp(frames, anchors, values)
+        curve[~fixed] = np.linalg.solve(system[np.ix_(~fixed, ~fixed)],
+                                        -system[np.ix_(~fixed, fixed)].dot(curve[fixed]))
+        result[channel] = curve
+    return result
+
+
+#*******************************************************************************
+# TESTS
+def test_batch_build_matches_single_flyer_build():
+    batch = make_fleet()
+    anim_sim.build_flyers(anim_sim.load_flyers(batch), batch, pool_size=2)
+    single = make_fleet()
+    build_one_by_one(single)
+    assert_same_curves(all_curves(batch), all_curves(single))
+
+
+def test_anchor_correction_matches_dense_solve():
+    count = 60
+    anchors = np.array([3, 17, 18, 30, 55])
+    offsets = np.array([[1.0, -2.0, -1.5, 4.0, 0.0], [0.0, 3.0, 3.0, -1.0, 2.0]])
+    correction = h.anchor_correction(count, anchors, offsets)
+    np.testing.assert_allclose(correction, dense_correction(count, anchors, offsets), atol=1e-9)
+    np.testing.assert_allclose(correction[:, anchors], offsets)
+
+
+def test_anchor_correction_holds_outside_anchors():
+    correction = h.anchor_correction(40, [10, 20], [[0.0, 10.0]])
+    assert correction.min() == 0.0 and correction.max() == 10.0
+    assert np.all(correction[0, :10] == 0.0) and np.all(correction[0, 20:] == 10.0)
+
+
+def test_anchor_correction_joins_hold_smoothly():
+    correction = h.anchor_correction(40, [10, 20, 30], [[0.0, 10.0, 0.0]])[0]
+    bend = np.abs(np.diff(correction, 2))
+    # bend[i] is centred on frame i + 1.
+    assert max(bend[8], bend[9], bend[28], bend[29]) <= bend[10:28].max()
+
+
+def test_anchor_update_matches_rebuild():
+    scene = make_scene()
+    flyer = anim_sim.load_flyers(scene)[0]
+    add_anchors(flyer, ANCHOR_FRAMES)
+    flyer.derive_rotation(*flyer.motion_plane)
+    flyer.anchors_rebuild(*flyer.motion_plane)
+    scene.nodes['ship_75_anchor']['attrs']['translateX'] += 3
+    flyer.sync_anchors()
+    assert 0 < flyer.anchors_update(*flyer.motion_plane) < len(flyer.key_frames)
+    updated = layer_curves(scene, flyer)
+
+    flyer.anchors_rebuild(*flyer.motion_plane)
+    assert_same_curves(updated, layer_curves(scene, flyer))
+
+
+def test_anchor_update_after_build_matches_rebuild():
+    scene = make_scene()
+    flyer = anim_sim.load_flyers(scene)[0]
+    add_anchors(flyer, ANCHOR_FRAMES)
+    flyer.anchors_rebuild(*flyer.motion_plane)
+    anim_sim.build_flyers([flyer], scene)
+    scene.nodes['ship_75_anchor']['attrs']['translateX'] += 3
+    flyer.sync_anchors()
+    flyer.anchors_update(*flyer.motion_plane)
+    updated = layer_curves(scene, flyer)
+
+    flyer.accel_axis_1 = []
+    flyer.anchors_rebuild(*flyer.motion_plane)
+    assert_same_curves(updated, layer_curves(scene, flyer))
+    frames, positions = flyer.read_anchors()
+    world = scene.sample_matrices(flyer.name, frames)[:, 3, :3]
+    np.testing.assert_allclose(world[:, [0, 2]], positions[:, [0, 2]], atol=1e-6)
+
+
+def test_remove_anchors_restores_clean_rotation():
+    scene = make_scene()
+    flyer = anim_sim.load_flyers(scene)[0]
+    flyer.derive_rotation(*flyer.motion_plane)
+    clean = layer_curves(scene, flyer)
+    add_anchors(flyer, ANCHOR_FRAMES)
+    scene.nodes['ship_75_anchor']['attrs']['translateX'] += 3
+    flyer.sync_anchors()
+    flyer.anchors_rebuild(*flyer.motion_plane)
+
+    # A new session knows nothing of the correction it removes.
+    fresh = anim_sim.load_flyers(scene)[0]
+    fresh.remove_anchors()
+    assert_same_curves(layer_curves(scene, fresh), clean)
+
+
+def test_disk_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'shot.json')
+    scene = make_fleet()
+    scene.save(path)
+    anim_sim.build_flyers(anim_sim.load_flyers(scene), scene)
+    built = all_curves(scene)
+
+    h.RAW_CACHE.clear()
+    reloaded = sc.load_memory_scene(path)
+    anim_sim.build_flyers(anim_sim.load_flyers(reloaded), reloaded)
+    assert reloaded.counters['samples_read'] == 0
+    assert_same_curves(all_curves(reloaded), built)
+
+
+def test_disk_cache_hit_sets_the_same_channels(tmp_path):
+    scene = make_scene()
+    scene.save(str(tmp_path / 'shot.json'))
+    flyers = []
+    for run in range(2):
+        h.RAW_CACHE.clear()
+        flyer = anim_sim.load_flyers(scene)[0]
+        flyer.derive_rotation(*flyer.motion_plane)
+        flyers.append(flyer)
+    for attr in ('raw_pos_axis_1', 'pos_axis_1', 'vel_axis_1', 'accel_axis_1', 'rot_axis_2'):
+        np.testing.assert_array_equal(getattr(flyers[0], attr), getattr(flyers[1], attr), err_msg=attr)
+
+
+def test_batch_memory_shots(tmp_path):
+    shots = []
+    for i in range(2):
+        shots.append(str(tmp_path / ('shot_%d.json' % i)))
+        make_fleet().save(shots[-1])
+    assert as_batch.main(shots + ['--memory', '--processes', '2', '--set', 'ship_2.fidelity=11']) == 0
+
+    expected = make_fleet()
+    expected.set_attr('ship_2_target.fidelity', 11)
+    build_one_by_one(expected)
+    for shot in shots:
+        assert_same_curves(all_curves(sc.load_memory_scene(shot)), all_curves(expected))
+
+
+def test_batch_skips_overrides_for_missing_targets(tmp_path):
+    path = str(tmp_path / 'shot.json')
+    make_scene().save(path)
+    report = as_batch.build_shot(path, as_batch.parse_overrides(['ship_2.fidelity=11']), memory=True)
+    assert report['error'] is None and report['flyers'] == 1